@@ -0,0 +1,115 @@
+"""
+Быстрое представление рецептов для чтения.
+
+Собирает тот же JSON, что и RecipelistSerializer, из строк .values()
+и словарей связанных объектов без полей DRF. Включается настройкой
+RECIPE_FAST_SERIALIZER.
+"""
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+
+from recipes.membership import FAVORITES, FOLLOWING, SHOPPING_CART
+from recipes.models import IngredientRecipe, Recipe, RecipeTag
+from .serializers import is_member
+
+# pub_date нужен keyset-пагинации, в ответ он не попадает.
+RECIPE_FIELDS = (
+    'id', 'name', 'image', 'image_renditions', 'text', 'cooking_time',
+    'favorites_count', 'in_carts_count', 'pub_date', 'author_id',
+    'author__email', 'author__username', 'author__first_name',
+    'author__last_name',
+)
+
+
+def get_tags(recipe_ids):
+    tags = defaultdict(list)
+    for row in RecipeTag.objects.filter(recipe_id__in=recipe_ids).order_by(
+            'tag_id'
+    ).values('recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'):
+        tags[row['recipe_id']].append({
+            'id': row['tag_id'],
+            'name': row['tag__name'],
+            'color': row['tag__color'],
+            'slug': row['tag__slug'],
+        })
+    return tags
+
+
+def get_ingredients(recipe_ids):
+    ingredients = defaultdict(list)
+    for row in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+    ).order_by('id').values(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    ):
+        ingredients[row['recipe_id']].append({
+            'id': row['ingredient_id'],
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['amount'],
+        })
+    return ingredients
+
+
+class FastRecipeSerializer:
+    """
+    Сериализатор только для чтения с интерфейсом serializer.data;
+    принимает строку или страницу строк из queryset.values(*RECIPE_FIELDS).
+    """
+    __slots__ = ('instance', 'many', 'context')
+
+    def __init__(self, instance, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    def absolute_url(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def represent(self, row, tags, ingredients):
+        context = self.context
+        image_storage = Recipe._meta.get_field('image').storage
+        return {
+            'id': row['id'],
+            'ingredients': ingredients.get(row['id'], []),
+            'tags': tags.get(row['id'], []),
+            'image': (
+                self.absolute_url(image_storage.url(row['image']))
+                if row['image'] else None
+            ),
+            'image_renditions': {
+                rendition: self.absolute_url(default_storage.url(name))
+                for rendition, name in row['image_renditions'].items()
+            },
+            'author': {
+                'email': row['author__email'],
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'is_subscribed': is_member(
+                    context, FOLLOWING, row['author_id']
+                ),
+            },
+            'is_favorited': is_member(context, FAVORITES, row['id']),
+            'name': row['name'],
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+            'is_in_shopping_cart': is_member(
+                context, SHOPPING_CART, row['id']
+            ),
+            'favorites_count': row['favorites_count'],
+            'in_carts_count': row['in_carts_count'],
+        }
+
+    @property
+    def data(self):
+        rows = list(self.instance) if self.many else [self.instance]
+        recipe_ids = [row['id'] for row in rows]
+        tags = get_tags(recipe_ids)
+        ingredients = get_ingredients(recipe_ids)
+        data = [self.represent(row, tags, ingredients) for row in rows]
+        return data if self.many else data[0]
@@ -1,42 +1,130 @@
 """
 Фильтры для поисков.
 """
-from django_filters import ModelMultipleChoiceFilter
+from django.db.models import Exists, F, OuterRef
 from django_filters.rest_framework import FilterSet
 from django_filters.rest_framework import filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
-from recipes.models import Ingredient, Recipe, Tag
+from backend import constants
+from recipes.autocomplete import autocomplete_ingredients
+from recipes.cache import get_tag_ids_by_slug
+from recipes.models import Recipe, RecipeTag
+from recipes.search import search_recipes
 
 
-class IngredientSearchFilter(SearchFilter):
-    """Фильтр для поиска по полю 'name' в IngredientViewSet."""
+class IngredientSearchFilter(BaseFilterBackend):
+    """
+    Поиск по началу поля 'name' в IngredientViewSet.
+
+    В действии autocomplete сначала идут ингредиенты, начинающиеся
+    с 'name', затем содержащие его; количество ограничивается
+    параметром 'limit'.
+    """
     search_param = 'name'
+    limit_param = 'limit'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return constants.INGREDIENT_AUTOCOMPLETE_LIMIT
+        return max(1, min(limit, constants.INGREDIENT_AUTOCOMPLETE_LIMIT_MAX))
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        if view.action == 'autocomplete':
+            return autocomplete_ingredients(
+                queryset, query, self.get_limit(request)
+            )
+        if view.action == 'list':
+            return queryset.filter(name__istartswith=query)
+        return queryset
 
-    class Meta:
-        model = Ingredient
-        fields = ('name', )
+
+class RecipeOrderingFilter(filters.OrderingFilter):
+    """
+    Сортировка ленты по счетчикам рецепта и по рейтингу
+    (popular, trending), при равенстве — по id.
+
+    popular и trending идут от высшего рейтинга к низшему, рецепты без
+    рейтинга — в конце; -popular и -trending — в точности обратный порядок.
+    """
+    rankings = {
+        'popular': 'ranking__popular_score',
+        'trending': 'ranking__trending_score',
+    }
+
+    def is_descending(self, param):
+        if param.lstrip('-') in self.rankings:
+            return not param.startswith('-')
+        return param.startswith('-')
+
+    def get_ordering_value(self, param):
+        name = param.lstrip('-')
+        if name in self.rankings:
+            # Как в индексах ranking_*_idx.
+            if self.is_descending(param):
+                return F(self.rankings[name]).desc(nulls_last=True)
+            return F(self.rankings[name]).asc(nulls_first=True)
+        return super().get_ordering_value(param)
+
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        if value:
+            # Id при равенстве — в направлении первого поля сортировки.
+            id_ordering = '-id' if self.is_descending(value[0]) else 'id'
+            qs = qs.order_by(*qs.query.order_by, id_ordering)
+        return qs
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids_by_slug()]
 
 
 class RecipeFilter(FilterSet):
     """
     Фильтр для поиска по полю 'is_favorited', 'is_in_shopping_cart',
-    'author', 'tags' в RecipeViewSet.
+    'author', 'tags' и полнотекстового поиска 'search' в RecipeViewSet.
     """
+    search = filters.CharFilter(method='search_method')
     is_favorited = filters.BooleanFilter(method='favorited_method')
     is_in_shopping_cart = filters.BooleanFilter(
         method='in_shopping_cart_method'
     )
-    tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        method='tags_method',
+        choices=get_tag_choices,
+    )
+    ordering = RecipeOrderingFilter(
+        fields=(
+            'favorites_count', 'in_carts_count', 'pub_date',
+            ('ranking__popular_score', 'popular'),
+            ('ranking__trending_score', 'trending'),
+        ),
     )
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags')
 
+    def tags_method(self, queryset, name, value):
+        if not value:
+            return queryset
+        tag_ids = get_tag_ids_by_slug()
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[tag_ids[slug] for slug in value if slug in tag_ids],
+        )))
+
+    def search_method(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
+
     def favorited_method(self, queryset, name, value):
 
         if value and self.request.user.is_authenticated:
@@ -0,0 +1,90 @@
+"""
+Метрики запросов: число SQL-запросов, время в базе и в приложении.
+"""
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('api.metrics')
+
+
+class QueryMetrics:
+    """Обертка для connection.execute_wrapper, считающая запросы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Отдает метрики запроса в заголовке Server-Timing и в лог api.metrics.
+
+    app — время работы view без запросов к базе (в основном
+    сериализация), render — отрисовка ответа DRF. Запросы, превысившие
+    REQUEST_METRICS_QUERY_BUDGET, логируются с уровнем WARNING.
+    Для потоковых ответов учитываются запросы до начала отдачи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = QueryMetrics()
+        request._metrics = {'queries': metrics}
+        started = time.perf_counter()
+        with connection.execute_wrapper(metrics):
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        self.report(request, response, metrics, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics['view_started'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request._metrics['view_finished'] = time.perf_counter()
+        request._metrics['view_db'] = request._metrics['queries'].duration
+        return response
+
+    def report(self, request, response, queries, total):
+        timings = {'db': queries.duration}
+        view_finished = request._metrics.get('view_finished')
+        if view_finished is not None:
+            timings['app'] = (
+                view_finished - request._metrics['view_started']
+                - request._metrics['view_db']
+            )
+            timings['render'] = time.perf_counter() - view_finished
+        timings['total'] = total
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.1f}'
+            + (f';desc="{queries.count} queries"' if name == 'db' else '')
+            for name, duration in timings.items()
+        )
+        resolver_match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': resolver_match.view_name if resolver_match else None,
+            'status': response.status_code,
+            'queries': queries.count,
+            'size': None if response.streaming else len(response.content),
+            **{f'{name}_ms': round(duration * 1000, 1)
+               for name, duration in timings.items()},
+        }
+        if queries.count > settings.REQUEST_METRICS_QUERY_BUDGET:
+            logger.warning('query budget exceeded %s', json.dumps(record))
+        else:
+            logger.info('request %s', json.dumps(record))
@@ -0,0 +1,130 @@
+"""
+Миксины для ViewSet'ов.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+
+from backend import constants
+from recipes.cache import get_version, make_key
+
+
+class CachedListMixin:
+    """
+    Кэширует ответ list под версией cache_namespace.
+
+    Ключ учитывает параметры запроса из cache_query_params, ответ
+    отдается с ETag и Cache-Control.
+    """
+    cache_namespace = None
+    cache_query_params = ()
+
+    def get_cache_key(self, request):
+        params = '&'.join(
+            f'{param}={request.query_params.get(param, "")}'
+            for param in self.cache_query_params
+        )
+        return make_key(
+            self.cache_namespace,
+            self.action,
+            hashlib.md5(params.encode()).hexdigest()
+        )
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            data = cache.get(key)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                cache.set(key, data, settings.REFERENCE_CACHE_TIMEOUT)
+            response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=constants.REFERENCE_CACHE_MAX_AGE
+        )
+        return response
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кэширует отрендеренный JSON ответов list и retrieve для анонимных
+    пользователей.
+
+    Ключ включает нормализованные параметры запроса и версии
+    пространств имен: общие из response_cache_namespaces, для list —
+    еще response_cache_list_namespace, для retrieve — версию объекта
+    из response_cache_object_namespace(pk).
+    """
+    response_cache_namespaces = ()
+    response_cache_list_namespace = None
+    response_cache_key = None
+
+    def response_cache_object_namespace(self, pk):
+        raise NotImplementedError
+
+    def get_response_cache_key(self, request):
+        if (not request.user.is_anonymous
+                or request.accepted_renderer.format != 'json'):
+            return None
+        namespaces = list(self.response_cache_namespaces)
+        if self.action == 'list':
+            namespaces.append(self.response_cache_list_namespace)
+        else:
+            namespaces.append(self.response_cache_object_namespace(
+                self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            ))
+        params = urlencode(sorted(
+            (param, value)
+            for param in request.query_params
+            for value in request.query_params.getlist(param)
+        ))
+        return ':'.join((
+            'response', self.basename, self.action,
+            *(str(get_version(namespace)) for namespace in namespaces),
+            hashlib.md5(
+                f'{request.get_host()}?{params}'.encode()
+            ).hexdigest(),
+        ))
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                content_type, content = cached
+                return HttpResponse(content, content_type=content_type)
+        response = handler(request, *args, **kwargs)
+        if key is not None and response.status_code == 200:
+            self.response_cache_key = key
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.response_cache_key is not None:
+            response.render()
+            cache.set(
+                self.response_cache_key,
+                (response['Content-Type'], response.content),
+                settings.RESPONSE_CACHE_TIMEOUT,
+            )
+        return response
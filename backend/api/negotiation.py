@@ -0,0 +1,19 @@
+"""
+Согласование формата ответа.
+"""
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FirstRendererFallbackNegotiation(DefaultContentNegotiation):
+    """
+    Если ни один рендерер не подходит под заголовок Accept, ответ
+    отдается первым из них вместо 406.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            renderer = renderers[0]
+            return renderer, renderer.media_type
@@ -1,10 +1,218 @@
 """
 Пагинация.
 """
+import binascii
+import json
+from base64 import b64decode, b64encode
+from datetime import datetime
+from functools import cmp_to_key
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Дата и время с микросекундами, чтобы ключ совпадал точно."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class LimitCursorPagination(pagination.BasePagination):
+    """
+    Keyset-пагинация по составному ключу без COUNT и OFFSET.
+
+    Курсор хранит значения полей ordering у крайнего объекта страницы,
+    следующая страница выбирается условием
+    a < x OR (a = x AND b < y) ... Последнее поле ordering должно быть
+    уникальным.
+    """
+    page_size = 6
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    ordering = ('-id',)
+
+    def get_page_size(self, request):
+        try:
+            return pagination._positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode(), validate=True))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+                len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        cursor = json.dumps(
+            {'p': position, 'r': int(reverse)}, cls=CursorEncoder
+        )
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            b64encode(cursor.encode()).decode()
+        )
+
+    def get_fields(self):
+        """Пары (поле, по убыванию ли) для текущего направления."""
+        return [
+            (field.lstrip('-'), field.startswith('-') != self.reverse)
+            for field in self.ordering
+        ]
+
+    def get_position(self, item):
+        return [
+            item[field] if isinstance(item, dict) else getattr(item, field)
+            for field, _ in self.get_fields()
+        ]
+
+    def get_keyset_filter(self, position):
+        fields = self.get_fields()
+        first, descending = fields[0]
+        # Условие на первое поле позволяет базе взять диапазон индекса.
+        keyset = Q(**{f'{first}__{"lte" if descending else "gte"}':
+                      position[0]})
+        branches = Q()
+        for index, (field, descending) in enumerate(fields):
+            branch = Q(**{f'{field}__{"lt" if descending else "gt"}':
+                          position[index]})
+            for (previous, _), value in zip(fields[:index], position):
+                branch &= Q(**{previous: value})
+            branches |= branch
+        return keyset & branches
+
+    def compare(self, first, second):
+        for (_, descending), a, b in zip(
+                self.get_fields(),
+                self.get_position(first), self.get_position(second)
+        ):
+            if a != b:
+                before = a > b if descending else a < b
+                return -1 if before else 1
+        return 0
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Страница из нескольких queryset'ов с одинаковыми полями
+        ordering: каждый дает не больше страницы, результат сливается.
+        """
+        self.limit = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        position, self.reverse = self.decode_cursor(request)
+        ordering = [
+            f'-{field}' if descending else field
+            for field, descending in self.get_fields()
+        ]
+        results = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*ordering)
+            if position is not None:
+                queryset = queryset.filter(self.get_keyset_filter(position))
+            results.extend(queryset[:self.limit + 1])
+        if len(querysets) > 1:
+            results.sort(key=cmp_to_key(self.compare))
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if self.reverse:
+            results.reverse()
+        has_next = has_more if not self.reverse else position is not None
+        has_previous = has_more if self.reverse else position is not None
+        self.next_position = (
+            self.get_position(results[-1]) if results and has_next else None
+        )
+        self.previous_position = (
+            self.get_position(results[0])
+            if results and has_previous else None
+        )
+        return results
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class FeedPagination(LimitCursorPagination):
+    """Keyset-пагинация ленты подписок по строкам (pub_date, recipe_id)."""
+    ordering = ('-pub_date', '-recipe_id')
 
 
 class LimitPagination(pagination.PageNumberPagination):
-    """Пагинация для RecipeViewSet, UserCustomViewSet."""
+    """
+    Пагинация для RecipeViewSet, UserCustomViewSet.
+
+    По умолчанию постраничная (?page=&limit=). С параметром ?cursor=
+    (для первой страницы пустым) переключается на keyset-пагинацию
+    по порядку queryset'а или cursor_ordering ViewSet'а. Для сортировок
+    по рейтингу остается постраничная пагинация.
+    """
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def get_cursor_ordering(self, queryset, view):
+        """
+        Порядок для keyset-пагинации или None, если queryset упорядочен
+        выражениями или полями связанных моделей либо это список.
+        """
+        query = getattr(queryset, 'query', None)
+        if query is None:
+            return None
+        ordering = query.order_by
+        if not ordering:
+            return (getattr(view, 'cursor_ordering', None)
+                    or LimitCursorPagination.ordering)
+        if all(isinstance(field, str) and '__' not in field
+               for field in ordering):
+            return ordering
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.get_cursor_ordering(queryset, view)
+        if (self.cursor_query_param not in request.query_params
+                or ordering is None):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = LimitCursorPagination()
+        self.cursor_paginator.ordering = ordering
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
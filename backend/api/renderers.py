@@ -0,0 +1,70 @@
+"""
+Рендереры для выгрузки списка покупок.
+"""
+import csv
+
+from rest_framework.renderers import BaseRenderer
+
+
+class Echo:
+    """Псевдо-буфер: csv.writer сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+
+    Формат выбирается параметром ?format=, а файл отдается
+    построчно через stream().
+    """
+    charset = 'utf-8'
+    title = 'Список необходимых ингредиентов:'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            return '\n'.join(
+                f'{key}: {value}' for key, value in data.items()
+            ).encode(self.charset)
+        return ''.join(self.stream(data)).encode(self.charset)
+
+    def stream(self, purchases):
+        raise NotImplementedError
+
+    @property
+    def filename(self):
+        return f'IngredientList.{self.format}'
+
+
+class TxtShoppingCartRenderer(ShoppingCartRenderer):
+    """Список покупок в текстовом виде."""
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, purchases):
+        yield self.title
+        for el in purchases:
+            yield (
+                f'\n • {el["ingredient__name"]}: {el["amount"]} '
+                f'{el["ingredient__measurement_unit"]}'
+            )
+
+
+class CsvShoppingCartRenderer(ShoppingCartRenderer):
+    """Список покупок в виде CSV."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, purchases):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+        for el in purchases:
+            yield writer.writerow((
+                el['ingredient__name'],
+                el['amount'],
+                el['ingredient__measurement_unit'],
+            ))
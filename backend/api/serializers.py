@@ -2,37 +2,97 @@
 Сериализаторы.
 """
 import base64
+import binascii
 
-from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
 from django.core.validators import (MaxLengthValidator, RegexValidator)
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
 from backend import constants
+from recipes.images import schedule_renditions
+from recipes.membership import (FAVORITES, FOLLOWING, SHOPPING_CART,
+                                contains, get_member_ids)
+from recipes.search import update_search_vectors
 from recipes.models import (Recipe, Ingredient, Tag,
-                            IngredientRecipe, Favorite,
-                            ShoppingCart)
+                            IngredientRecipe, Favorite, FeedItem,
+                            ShoppingCart, ShoppingCartTotal)
 from users.models import User, Follow
 
 
+def is_member(context, kind, member_id):
+    """
+    Проверяет связь текущего пользователя по кэшу принадлежности;
+    множество читается из кэша один раз на сериализацию.
+    """
+    request = context.get('request')
+    if request is None or request.user.is_anonymous:
+        return False
+    memberships = context.setdefault('memberships', {})
+    if kind not in memberships:
+        memberships[kind] = get_member_ids(kind, request.user.id)
+    return contains(memberships[kind], member_id)
+
+
 class Base64ImageField(serializers.ImageField):
-    """Сериализатор для изображений."""
+    """
+    Сериализатор для изображений.
+
+    Base64 декодируется частями во временный файл, поэтому в памяти
+    не держится вторая копия изображения.
+    """
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode(imgstr, 'temp.' + ext, format[len('data:'):])
 
         return super().to_internal_value(data)
 
+    def decode(self, imgstr, name, content_type):
+        if len(imgstr) * 3 // 4 > constants.IMAGE_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Размер изображения не должен превышать '
+                f'{constants.IMAGE_MAX_SIZE // (1024 * 1024)} МБ.'
+            )
+        file = TemporaryUploadedFile(name, content_type, 0, None)
+        chunk_size = constants.IMAGE_DECODE_CHUNK_SIZE
+        try:
+            for start in range(0, len(imgstr), chunk_size):
+                file.write(base64.b64decode(
+                    imgstr[start:start + chunk_size], validate=True
+                ))
+        except binascii.Error:
+            file.close()
+            raise serializers.ValidationError(
+                'Изображение должно быть закодировано в base64.'
+            )
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии изображения рецепта."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        renditions = {}
+        for rendition, name in value.items():
+            url = default_storage.url(name)
+            renditions[rendition] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return renditions
+
 
 class WriteIngredientInRecipe(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientRecipe
@@ -137,24 +197,21 @@ class UserGetSerializer(UserSerializer):
                   )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return (request
-                and request.user.is_authenticated
-                and request.user.follower.filter(user=obj).exists()
-                )
+        return is_member(self.context, FOLLOWING, obj.id)
 
 
 class ViewRecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_renditions', 'cooking_time']
 
 
 class FollowSerializer(UserGetSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta(UserGetSerializer.Meta):
         fields = UserGetSerializer.Meta.fields + (
@@ -162,25 +219,31 @@ class FollowSerializer(UserGetSerializer):
             'recipes_count',
         )
 
+    @staticmethod
+    def get_recipes_limit(request):
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            return int(recipes_limit)
+        except ValueError:
+            raise ValueError(
+                'Передано не значение, запрос принимает только число!'
+                'Неправильные данные: "один", "два" и т.д.,'
+                'Правильные данные: 1, 2, "2", "1" и т.д.'
+            )
+
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes = obj.recipes.all()
         if not request or request.user.is_anonymous:
             return None
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit is not None:
-            try:
-                int(recipes_limit)
-            except ValueError:
-                raise ValueError(
-                    'Передано не значение, запрос принимает только число!'
-                    'Неправильные данные: "один", "два" и т.д.,'
-                    'Правильные данные: 1, 2, "2", "1" и т.д.'
-                )
-            else:
-                recipes = recipes[:int(recipes_limit)]
+        if hasattr(obj, 'recipes_preview'):
+            recipes = obj.recipes_preview
         else:
-            recipes = recipes
+            recipes = obj.recipes.order_by('-pub_date')
+            recipes_limit = self.get_recipes_limit(request)
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         serializer = ViewRecipeSerializer(
             recipes,
             many=True
@@ -232,39 +295,41 @@ class RecipelistSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientAmountSerializer(many=True,
                                                    source='ingredientrecipes')
     image = Base64ImageField()
+    image_renditions = ImageRenditionsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'ingredients', 'tags', 'image', 'author', 'is_favorited',
-            'name', 'text', 'cooking_time', 'is_in_shopping_cart'
+            'id', 'ingredients', 'tags', 'image', 'image_renditions',
+            'author', 'is_favorited', 'name', 'text', 'cooking_time',
+            'is_in_shopping_cart', 'favorites_count', 'in_carts_count'
         )
+        read_only_fields = ('favorites_count', 'in_carts_count')
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if self.context['request'] is None or (
-                self.context['request'].user.is_anonymous
-        ):
-            return False
-        return obj.favorites.filter(user=user).exists()
+        return is_member(self.context, FAVORITES, obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if self.context['request'] is None or (
-                self.context['request'].user.is_anonymous
-        ):
-            return False
-        return obj.shopping_cart.filter(user=user).exists()
+        return is_member(self.context, SHOPPING_CART, obj.id)
+
+
+class RecipeCoverageSerializer(RecipelistSerializer):
+    """Рецепт с покрытием ингредиентами из запроса."""
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipelistSerializer.Meta):
+        fields = RecipelistSerializer.Meta.fields + (
+            'coverage', 'missing_ingredients'
+        )
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = WriteIngredientInRecipe(many=True)
     image = Base64ImageField()
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
 
     class Meta:
         model = Recipe
@@ -273,43 +338,43 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'name', 'text', 'cooking_time',
         )
 
-    def check_for_a_duplicate(self, data, variable, text):
-        object = self.initial_data.get(variable)
-        if (len(object)
-                == constants.MIN_NUMBER_OF_TAGS_AND_INGREDIENT_IN_RECIPE):
-            return data
-        is_duplicate = False
-        for el in object:
-            if (object.count(el)
-                    > constants.MIN_NUMBER_OF_TAGS_AND_INGREDIENT_IN_RECIPE):
-                is_duplicate = True
-        if is_duplicate:
+    def get_objects(self, model, ids, duplicate_text, missing_text):
+        """
+        Проверяет список id одним запросом и возвращает объекты
+        в виде словаря {id: объект}.
+        """
+        if not ids:
             raise serializers.ValidationError(
-                text
+                'Поле обязательное к заполнению.'
             )
-        return data
-
-    def validate_ingredients(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(duplicate_text)
+        objects = model.objects.in_bulk(ids)
+        missing = [str(pk) for pk in ids if pk not in objects]
+        if missing:
             raise serializers.ValidationError(
-                'Поле обязательное к заполнению.'
+                f'{missing_text}: {", ".join(missing)}.'
             )
-        return self.check_for_a_duplicate(
-            data, 'ingredients',
-            'Ингридиенты не должны повторяться'
+        return objects
+
+    def validate_ingredients(self, data):
+        ingredients = self.get_objects(
+            Ingredient,
+            [ingredient['id'] for ingredient in data],
+            'Ингридиенты не должны повторяться',
+            'Ингредиенты не найдены',
         )
+        for ingredient in data:
+            ingredient['id'] = ingredients[ingredient['id']]
+        return data
 
     def validate_tags(self, data):
-        tags = self.initial_data.get('tags')
-        if not tags:
-            raise serializers.ValidationError(
-                'Поле обязательное к заполнению.'
-            )
-        return self.check_for_a_duplicate(
-            data, 'tags',
-            'Тэги не должны дублироваться'
+        tags = self.get_objects(
+            Tag, data,
+            'Тэги не должны дублироваться',
+            'Тэги не найдены',
         )
+        return [tags[pk] for pk in data]
 
     def validate_cooking_time(self, data):
         if data < constants.RECIPE_COOKING_TIME_MIN:
@@ -344,22 +409,94 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         self.create_ingredients(data_ing, recipe)
         recipe.tags.set(data_tags)
         recipe.save()
+        update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
+        FeedItem.objects.fan_out(recipe)
+        schedule_renditions(recipe)
         return recipe
 
+    def update_ingredients(self, instance, ingredients_data):
+        """
+        Приводит ингредиенты рецепта к ingredients_data, затрагивая
+        только изменившиеся строки. Возвращает прежние количества.
+        """
+        existing = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in instance.ingredientrecipes.all()
+        }
+        old_amounts = {
+            ingredient_id: ingredient_recipe.amount
+            for ingredient_id, ingredient_recipe in existing.items()
+        }
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients_data
+        }
+        to_update = []
+        for ingredient_id, amount in amounts.items():
+            ingredient_recipe = existing.get(ingredient_id)
+            if ingredient_recipe and ingredient_recipe.amount != amount:
+                ingredient_recipe.amount = amount
+                to_update.append(ingredient_recipe)
+        to_delete = [
+            ingredient_recipe.id
+            for ingredient_id, ingredient_recipe in existing.items()
+            if ingredient_id not in amounts
+        ]
+        if to_delete:
+            IngredientRecipe.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            IngredientRecipe.objects.bulk_update(to_update, ['amount'])
+        self.create_ingredients(
+            [ingredient for ingredient in ingredients_data
+             if ingredient['id'].id not in existing],
+            recipe=instance,
+        )
+        return old_amounts
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        IngredientRecipe.objects.filter(recipe=instance).delete()
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
-        instance.tags.clear()
         instance.tags.set(tags_data)
-        self.create_ingredients(
-            ingredients_data,
-            recipe=instance,
+        old_amounts = self.update_ingredients(instance, ingredients_data)
+        ShoppingCartTotal.objects.change_recipe(
+            instance,
+            old_amounts,
+            {
+                ingredient['id'].id: ingredient['amount']
+                for ingredient in ingredients_data
+            },
         )
-        return super().update(instance, validated_data)
+        old_image = instance.image.name
+        instance = super().update(instance, validated_data)
+        update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+        if instance.image.name != old_image:
+            instance.image_renditions = {}
+            Recipe.objects.filter(id=instance.id).update(image_renditions={})
+            schedule_renditions(instance)
+        return instance
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            # Временный файл изображения после сохранения уже перемещен
+            # в хранилище, закрываем его явно.
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredientrecipes',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            ),
+        )
         serializer = RecipelistSerializer(
             instance,
             context={'request': self.context.get('request')},
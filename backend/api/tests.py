@@ -0,0 +1,367 @@
+"""
+Тесты API рецептов.
+"""
+import io
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Prefetch
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+
+from api.fast_serializers import RECIPE_FIELDS, FastRecipeSerializer
+from api.serializers import RecipelistSerializer
+from recipes.cache import INGREDIENTS, TAGS, get_version
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            RecipeRanking, ShoppingCart, ShoppingCartTotal,
+                            Tag)
+from users.models import Follow, User
+
+RECIPES_COUNT = 20
+
+
+class RecipeApiTestCase(TestCase):
+    """Общие данные: авторы, тэги, ингредиенты и рецепты со связями."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Рецептов', password='pass',
+        )
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{index}@foodgram.ru',
+                username=f'author{index}', first_name='Автор',
+                last_name=str(index), password='pass',
+            )
+            for index in range(3)
+        ]
+        cls.tags = [
+            Tag.objects.create(name=f'Тэг {index}', color=f'#00000{index}',
+                               slug=f'tag{index}')
+            for index in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(10)
+        ]
+        for index in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=cls.authors[index % len(cls.authors)],
+                name=f'Рецепт {index}',
+                text='Описание',
+                cooking_time=index + 1,
+                image=f'recipes/images/{index}.png',
+                image_renditions={
+                    'thumbnail': f'recipes/renditions/{index}-thumbnail.webp',
+                    'card': f'recipes/renditions/{index}-card.webp',
+                },
+            )
+            recipe.tags.set(cls.tags[:index % len(cls.tags) + 1])
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                                 amount=offset + 1)
+                for offset, ingredient in enumerate(
+                    cls.ingredients[index % 5:index % 5 + 4]
+                )
+            )
+            if index % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if index % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Follow.objects.create(user=cls.user, following=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous_client = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class RecipeListQueriesTest(RecipeApiTestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+    # Slug тэгов для фильтра, COUNT, рецепты с авторами, тэги, ингредиенты.
+    anonymous_queries = 5
+    # Плюс загрузка кэша принадлежности: избранное, покупки, подписки.
+    authenticated_queries = 8
+
+    def assert_list_queries(self, client, queries):
+        for limit in (1, 6, RECIPES_COUNT):
+            cache.clear()
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = client.get('/api/recipes/', {'limit': limit})
+            self.assertEqual(len(response.json()['results']), limit)
+
+    def test_anonymous_list_queries(self):
+        self.assert_list_queries(self.anonymous_client, self.anonymous_queries)
+
+    def test_authenticated_list_queries(self):
+        self.assert_list_queries(self.client, self.authenticated_queries)
+
+    def test_authenticated_list_flags(self):
+        response = self.client.get('/api/recipes/', {'limit': RECIPES_COUNT})
+        favorites = set(Favorite.objects.filter(
+            user=self.user).values_list('recipe_id', flat=True))
+        cart = set(ShoppingCart.objects.filter(
+            user=self.user).values_list('recipe_id', flat=True))
+        for recipe in response.json()['results']:
+            self.assertEqual(recipe['is_favorited'], recipe['id'] in favorites)
+            self.assertEqual(recipe['is_in_shopping_cart'],
+                             recipe['id'] in cart)
+            self.assertEqual(recipe['author']['is_subscribed'],
+                             recipe['author']['id'] == self.authors[0].id)
+
+
+class FastRecipeSerializerParityTest(RecipeApiTestCase):
+    """FastRecipeSerializer отдает то же, что RecipelistSerializer."""
+
+    def get_request(self, user=None):
+        request = APIRequestFactory().get('/api/recipes/')
+        if user is not None:
+            force_authenticate(request, user)
+        return Request(request)
+
+    def serialize(self, recipe_ids, user=None):
+        context = {'request': self.get_request(user)}
+        recipes = Recipe.objects.filter(id__in=recipe_ids)
+        fast = FastRecipeSerializer(
+            recipes.values(*RECIPE_FIELDS), many=True, context=context
+        ).data
+        regular = RecipelistSerializer(
+            recipes.select_related('author').prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.order_by('id')),
+                Prefetch(
+                    'ingredientrecipes',
+                    queryset=IngredientRecipe.objects.select_related(
+                        'ingredient'
+                    ).order_by('id')
+                ),
+            ),
+            many=True,
+            context={'request': self.get_request(user)},
+        ).data
+        return fast, regular
+
+    def test_serializers_parity(self):
+        recipe_ids = Recipe.objects.values_list('id', flat=True)
+        for user in (None, self.user):
+            with self.subTest(user=user):
+                fast, regular = self.serialize(recipe_ids, user)
+                self.assertEqual(fast, regular)
+                self.assertTrue(fast[0]['image'].startswith('http://'))
+                self.assertEqual(
+                    set(fast[0]['image_renditions']), {'thumbnail', 'card'}
+                )
+        fast, _ = self.serialize(recipe_ids, self.user)
+        self.assertTrue(any(recipe['is_favorited'] for recipe in fast))
+        self.assertTrue(any(recipe['is_in_shopping_cart'] for recipe in fast))
+        self.assertTrue(any(
+            recipe['author']['is_subscribed'] for recipe in fast
+        ))
+
+    def test_responses_parity(self):
+        recipe = Recipe.objects.first()
+        urls = (
+            f'/api/recipes/?limit={RECIPES_COUNT}',
+            '/api/recipes/?tags=tag1&ordering=-favorites_count',
+            '/api/recipes/?cursor=&limit=5',
+            f'/api/recipes/{recipe.id}/',
+        )
+        for client in (self.anonymous_client, self.client):
+            for url in urls:
+                responses = []
+                for fast in (False, True):
+                    cache.clear()
+                    with override_settings(RECIPE_FAST_SERIALIZER=fast):
+                        responses.append(client.get(url))
+                with self.subTest(url=url, client=client):
+                    self.assertEqual(responses[0].status_code, 200)
+                    self.assertEqual(
+                        responses[0].content, responses[1].content
+                    )
+
+
+class AnonymousResponseCacheTest(RecipeApiTestCase):
+    """Кэш ответов для анонимов сбрасывается изменениями рецептов."""
+
+    def test_deleted_recipe_detail_is_not_served_from_cache(self):
+        # Рецепт без избранного и покупок: их удаление каскадом само
+        # сбросило бы версию рецепта.
+        recipe = Recipe.objects.get(name='Рецепт 0')
+        url = f'/api/recipes/{recipe.id}/'
+        self.assertEqual(self.anonymous_client.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                recipe.delete()
+        self.assertEqual(self.anonymous_client.get(url).status_code, 404)
+
+
+class ReferenceCacheInvalidationTest(TestCase):
+    """Версии кэша справочников меняются только после коммита."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_versions_bumped_on_commit(self):
+        for namespace, create in (
+                (TAGS, lambda: Tag.objects.create(
+                    name='Завтрак', color='#00ff00', slug='breakfast')),
+                (INGREDIENTS, lambda: Ingredient.objects.create(
+                    name='соль', measurement_unit='г'))):
+            with self.subTest(namespace=namespace):
+                version = get_version(namespace)
+                with self.captureOnCommitCallbacks(execute=True):
+                    with transaction.atomic():
+                        create()
+                        self.assertEqual(get_version(namespace), version)
+                self.assertNotEqual(get_version(namespace), version)
+
+
+class DenormalizedCountersSaveTest(RecipeApiTestCase):
+    """Сохранение устаревшего объекта не затирает счетчики."""
+
+    def test_stale_user_save_keeps_counters(self):
+        author = User.objects.get(pk=self.authors[1].pk)
+        Follow.objects.create(user=self.authors[0], following=author)
+        Follow.objects.create(user=self.user, following=author)
+        author.set_password('new-pass')
+        author.save()
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 2)
+        self.assertTrue(author.check_password('new-pass'))
+
+    def test_stale_recipe_save_keeps_counters(self):
+        recipe = Recipe.objects.get(name='Рецепт 0')
+        Favorite.objects.create(user=self.authors[0], recipe=recipe)
+        recipe.name = 'Новое название'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.name, 'Новое название')
+
+
+class AdminCartTotalsTest(RecipeApiTestCase):
+    """Правка ингредиентов в админке обновляет итоги списка покупок."""
+
+    class Form:
+        def __init__(self, instance):
+            self.instance = instance
+
+        def save_m2m(self):
+            pass
+
+    class Formset:
+        def __init__(self, recipe, ingredient):
+            self.recipe = recipe
+            self.ingredient = ingredient
+
+        def save(self):
+            IngredientRecipe.objects.filter(recipe=self.recipe).delete()
+            IngredientRecipe.objects.create(
+                recipe=self.recipe, ingredient=self.ingredient, amount=100
+            )
+
+    def test_inline_edit_changes_cart_totals(self):
+        recipe = Recipe.objects.get(name='Рецепт 1')
+        site._registry[Recipe].save_related(
+            None, self.Form(recipe),
+            [self.Formset(recipe, self.ingredients[9])], True,
+        )
+        live = {
+            (row['recipe__shopping_cart__user'], row['ingredient']):
+                row['total']
+            for row in ShoppingCartTotal.objects.get_live_totals()
+        }
+        stored = dict(
+            ((user, ingredient), amount)
+            for user, ingredient, amount in ShoppingCartTotal.objects
+            .values_list('user_id', 'ingredient_id', 'amount')
+        )
+        self.assertEqual(stored, live)
+
+
+class DownloadShoppingCartTest(RecipeApiTestCase):
+    """Выбор формата файла списка покупок."""
+
+    url = '/api/recipes/download_shopping_cart/'
+
+    def get_content_type(self, **kwargs):
+        response = self.client.get(self.url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response['Content-Type'].split(';')[0]
+
+    def test_format_from_accept_and_query(self):
+        self.assertEqual(self.get_content_type(HTTP_ACCEPT='text/csv'),
+                         'text/csv')
+        self.assertEqual(self.get_content_type(data={'format': 'csv'}),
+                         'text/csv')
+
+    def test_json_accept_falls_back_to_txt(self):
+        self.assertEqual(
+            self.get_content_type(HTTP_ACCEPT='application/json'),
+            'text/plain',
+        )
+
+
+class RecipeOrderingTest(RecipeApiTestCase):
+    """Сортировка по рейтингу и обратная к ней."""
+
+    def get_ids(self, ordering):
+        response = self.anonymous_client.get(
+            '/api/recipes/', {'ordering': ordering, 'limit': RECIPES_COUNT}
+        )
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_ranking_ordering(self):
+        call_command('refresh_rankings', stdout=io.StringIO())
+        for ordering in ('popular', 'trending'):
+            with self.subTest(ordering=ordering):
+                scores = dict(RecipeRanking.objects.values_list(
+                    'recipe_id', f'{ordering}_score'
+                ))
+                ids = self.get_ids(ordering)
+                self.assertEqual(scores.get(ids[0]), max(scores.values()))
+                self.assertNotIn(ids[-1], scores)
+
+    def test_reverse_ordering(self):
+        call_command('refresh_rankings', stdout=io.StringIO())
+        for ordering in ('popular', 'trending', 'favorites_count'):
+            with self.subTest(ordering=ordering):
+                self.assertEqual(self.get_ids(f'-{ordering}'),
+                                 self.get_ids(ordering)[::-1])
+
+
+class IngredientSearchTest(TestCase):
+    """Поиск ингредиентов по началу названия и автодополнение."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('соль', 'морская соль', 'сольный сыр', 'сахар'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+
+    def get_names(self, url, params):
+        return [item['name'] for item in self.client.get(url, params).json()]
+
+    def test_name_filter_is_prefix_only(self):
+        self.assertEqual(
+            sorted(self.get_names('/api/ingredients/', {'name': 'соль'})),
+            ['соль', 'сольный сыр'],
+        )
+
+    def test_autocomplete_puts_prefix_matches_first(self):
+        url = '/api/ingredients/autocomplete/'
+        self.assertEqual(
+            self.get_names(url, {'name': 'соль'}),
+            ['соль', 'сольный сыр', 'морская соль'],
+        )
+        self.assertEqual(self.get_names(url, {'name': 'соль', 'limit': 1}),
+                         ['соль'])
@@ -1,46 +1,93 @@
 """
 ViewSets.
 """
-from django.db.models import Sum
-from django.http import HttpResponse
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, F, Max, OuterRef, Prefetch, Subquery
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (IsAuthenticatedOrReadOnly,
                                         IsAuthenticated)
 from rest_framework.response import Response
 
-from recipes.models import (Recipe, Ingredient, Tag, Favorite,
-                            ShoppingCart, IngredientRecipe)
+from backend import constants
+from recipes.cache import (INGREDIENTS, RECIPES, TAGS, USERS,
+                           get_recipe_namespace)
+from recipes.coverage import rank_recipes_by_ingredients
+from recipes.models import (Recipe, Ingredient, Tag, Favorite, FeedItem,
+                            ShoppingCart, ShoppingCartTotal,
+                            IngredientRecipe)
 from users.models import User, Follow
+from .fast_serializers import RECIPE_FIELDS, FastRecipeSerializer
 from .filters import IngredientSearchFilter, RecipeFilter
-from .pagination import LimitPagination
+from .mixins import AnonymousResponseCacheMixin, CachedListMixin
+from .negotiation import FirstRendererFallbackNegotiation
+from .pagination import FeedPagination, LimitPagination
 from .permissions import IsAuthorOrAuthOrReadOnly
+from .renderers import CsvShoppingCartRenderer, TxtShoppingCartRenderer
 from .serializers import (RecipelistSerializer, IngredientSerializer,
                           TagSerializer, FavoriteSerializer,
                           UserCreateSerializer, RecipeCreateSerializer,
                           FollowSerializer, ShoppingCartSerializer,
-                          FollowMakeSerializer)
+                          FollowMakeSerializer, RecipeCoverageSerializer)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousResponseCacheMixin, viewsets.ModelViewSet):
     """ViewSet для рецептов."""
+    response_cache_namespaces = (TAGS, INGREDIENTS, USERS)
+    response_cache_list_namespace = RECIPES
     serializer_class = RecipelistSerializer
     permission_classes = [IsAuthorOrAuthOrReadOnly]
     pagination_class = LimitPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    cursor_ordering = ('-pub_date', '-id')
+
+    def response_cache_object_namespace(self, pk):
+        return get_recipe_namespace(pk)
+
+    def use_fast_serializer(self):
+        return (settings.RECIPE_FAST_SERIALIZER
+                and self.action in ('list', 'feed', 'retrieve'))
 
     def get_serializer_class(self):
-        if self.action in ('list'):
+        if self.use_fast_serializer():
+            return FastRecipeSerializer
+        if self.action in ('list', 'feed'):
             return RecipelistSerializer
+        if self.action == 'what_to_cook':
+            return RecipeCoverageSerializer
         return RecipeCreateSerializer
 
     def get_queryset(self):
-        return Recipe.objects.all().prefetch_related(
-            'tags').select_related('author')
+        queryset = Recipe.objects.all()
+        if self.use_fast_serializer():
+            return queryset.values(*RECIPE_FIELDS)
+        queryset = queryset.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredientrecipes',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            ),
+        ).select_related('author').defer('search_vector')
+        return queryset
+
+    def get_recipes_by_id(self, recipe_ids):
+        """Словарь id -> рецепт (или строка быстрого пути) из get_queryset."""
+        return {
+            recipe['id'] if isinstance(recipe, dict) else recipe.id: recipe
+            for recipe in self.get_queryset().filter(id__in=recipe_ids)
+        }
 
     def add_recipe_favorite_or_shopping_card(
             self, request, pk, serializer_data
@@ -83,30 +130,103 @@ class RecipeViewSet(viewsets.ModelViewSet):
             request, pk, ShoppingCart
         )
 
+    def get_shopping_cart_etag(self, request):
+        """ETag по версии списка покупок: состав и изменения рецептов."""
+        version = ShoppingCart.objects.filter(user=request.user).aggregate(
+            count=Count('id'),
+            last_id=Max('id'),
+            updated=Max('recipe__updated'),
+        )
+        key = '{format}:{count}:{last_id}:{updated}'.format(
+            format=request.accepted_renderer.format, **version
+        )
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
     @action(detail=False, methods=('get',),
-            permission_classes=[IsAuthenticated])
-    def download_shopping_cart(self, request):
-        purchases = (
-            IngredientRecipe.objects.filter(
-                recipe__shopping_cart__user=self.request.user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(amount=Sum('amount'))
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        page = self.paginator.paginate_querysets(
+            FeedItem.objects.get_sources(request.user), request, view=self
         )
-        ingredient_list = [
-            'Список необходимых ингредиентов:',
-        ]
-        for el in purchases:
-            ingredient_list.append(
-                f' • {el["ingredient__name"]}: {el["amount"]} '
-                f'{el["ingredient__measurement_unit"]}'
+        recipes = self.get_recipes_by_id([row['recipe_id'] for row in page])
+        serializer = self.get_serializer(
+            [recipes[row['recipe_id']] for row in page
+             if row['recipe_id'] in recipes],
+            many=True,
+        )
+        return self.get_paginated_response(serializer.data)
+
+    def get_ingredient_ids(self, request):
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            }
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Ожидается список id ингредиентов.'}
             )
-        file = '\n'.join(ingredient_list)
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': 'Укажите хотя бы один ингредиент.'}
+            )
+        if len(ingredient_ids) > constants.WHAT_TO_COOK_MAX_INGREDIENTS:
+            raise ValidationError({'ingredients': (
+                'Не больше '
+                f'{constants.WHAT_TO_COOK_MAX_INGREDIENTS} ингредиентов.'
+            )})
+        return ingredient_ids
+
+    @action(detail=False, methods=('get',))
+    def what_to_cook(self, request):
+        """
+        Рецепты по имеющимся ингредиентам (?ingredients=1,2,3):
+        сначала с наибольшей долей покрытых ингредиентов.
+        """
+        ranked = rank_recipes_by_ingredients(self.get_ingredient_ids(request))
+        page = self.paginate_queryset(ranked)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        results = []
+        for recipe_id, coverage, missing in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = coverage
+            recipe.missing_ingredients = missing
+            results.append(recipe)
+        serializer = self.get_serializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
 
-        response = HttpResponse(file, content_type='text/plain')
+    @action(detail=False, methods=('get',),
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[TxtShoppingCartRenderer,
+                              CsvShoppingCartRenderer],
+            content_negotiation_class=FirstRendererFallbackNegotiation)
+    def download_shopping_cart(self, request):
+        etag = self.get_shopping_cart_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+        purchases = (
+            ShoppingCartTotal.objects.filter(user=self.request.user)
+            .values('ingredient__name', 'ingredient__measurement_unit',
+                    'amount')
+            .order_by('ingredient__name')
+            .iterator(chunk_size=constants.SHOPPING_CART_CHUNK_SIZE)
+        )
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(purchases),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
         response[
             'Content-Disposition'
-        ] = 'attachment; filename=IngredientList.txt'
-
+        ] = f'attachment; filename={renderer.filename}'
+        response['ETag'] = etag
         return response
 
 
@@ -122,10 +242,35 @@ class UserCreateAndSubscribeViewSet(UserViewSet):
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
+    def get_recipes_preview_queryset(self, request):
+        """
+        Последние recipes_limit рецептов каждого автора страницы
+        одним запросом.
+        """
+        recipes = Recipe.objects.order_by('-pub_date')
+        recipes_limit = FollowSerializer.get_recipes_limit(request)
+        if recipes_limit is None:
+            return recipes
+        return recipes.filter(id__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author')
+            ).order_by('-pub_date').values('id')[:recipes_limit]
+        ))
+
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        subscriptions = User.objects.filter(following__user=self.request.user)
+        subscriptions = User.objects.filter(
+            following__user=self.request.user
+        ).annotate(
+            follow_id=F('following__id'),
+        ).order_by('-follow_id').prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=self.get_recipes_preview_queryset(request),
+                to_attr='recipes_preview',
+            )
+        )
         page = self.paginate_queryset(subscriptions)
         serializer = FollowSerializer(
             page,
@@ -152,17 +297,27 @@ class UserCreateAndSubscribeViewSet(UserViewSet):
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для Ингредиентов."""
+    cache_namespace = INGREDIENTS
+    cache_query_params = ('name', 'limit')
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filter_backends = [IngredientSearchFilter]
-    search_fields = ('^name',)
+
+    @action(detail=False, methods=('get',))
+    def autocomplete(self, request):
+        """
+        Автодополнение: ингредиенты, начинающиеся с name, затем
+        содержащие его, не больше limit штук.
+        """
+        return self.list(request)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для Тэгов."""
+    cache_namespace = TAGS
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
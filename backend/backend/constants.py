@@ -15,5 +15,40 @@ USER_PASSWORD_MAX_LENGHT = 150
 USER_FIRST_NAME_MAX_LENGHT = 150
 USER_LAST_NAME_MAX_LENGHT = 150
 USER_USERNAME_MAX_LENGHT = 150
-"""Константы для Проверки на дубликат."""
-MIN_NUMBER_OF_TAGS_AND_INGREDIENT_IN_RECIPE = 1
+"""Константы для выгрузки списка покупок."""
+SHOPPING_CART_CHUNK_SIZE = 2000
+"""Константы для автодополнения ингредиентов."""
+INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+INGREDIENT_AUTOCOMPLETE_LIMIT_MAX = 100
+"""Константы для кэширования справочников."""
+REFERENCE_CACHE_MAX_AGE = 60
+"""Константы для импорта справочников."""
+IMPORT_BATCH_SIZE = 1000
+"""Константы для изображений рецептов."""
+IMAGE_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_DECODE_CHUNK_SIZE = 4 * 256 * 1024
+IMAGE_THUMBNAIL_SIZE = (160, 160)
+IMAGE_CARD_SIZE = (480, 480)
+IMAGE_FULL_SIZE = (1280, 1280)
+IMAGE_RENDITION_QUALITY = 80
+GC_MEDIA_MIN_AGE = 60 * 60
+"""Константы для рейтинга рецептов."""
+RANKING_FAVORITE_WEIGHT = 1.0
+RANKING_SHOPPING_CART_WEIGHT = 0.5
+RANKING_POPULAR_HALF_LIFE_DAYS = 30
+RANKING_TRENDING_HALF_LIFE_DAYS = 1
+RANKING_TRENDING_WINDOW_DAYS = 7
+RANKING_CHUNK_SIZE = 5000
+"""Константы для ленты подписок."""
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_BACKFILL_RECIPES = 50
+FEED_BATCH_SIZE = 1000
+"""Константы для полнотекстового поиска рецептов."""
+SEARCH_CONFIG = 'russian'
+"""Константы для подбора рецептов по ингредиентам."""
+WHAT_TO_COOK_MAX_INGREDIENTS = 100
+RECIPE_INDEX_GAP_TIMEOUT = 10 * 60
+RECIPE_CHANGE_TTL = 24 * 60 * 60
+RECIPE_INDEX_CHUNK_SIZE = 10000
+"""Константы для кэша принадлежности."""
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
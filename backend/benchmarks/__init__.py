@@ -0,0 +1,9 @@
+"""
+Нагрузочные замеры горячих путей API.
+
+Запуск из каталога backend:
+    python -m benchmarks --users 200 --recipes 2000 --output result.json
+
+Данные создаются в отдельной тестовой базе, которая удаляется
+после замеров.
+"""
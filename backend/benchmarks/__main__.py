@@ -0,0 +1,71 @@
+"""
+Точка входа: python -m benchmarks.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from pathlib import Path
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=100,
+                        help='Запросов на сценарий.')
+    parser.add_argument('--scenario', action='append', dest='scenarios',
+                        help='Запустить только указанные сценарии.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Файл для JSON-отчета.')
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment
+
+    from benchmarks import driver, seed
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        cache.clear()
+        users = seed.seed(args.users, args.recipes, random_seed=args.seed)
+        results = driver.run(
+            users, args.requests, args.scenarios, random_seed=args.seed
+        )
+    finally:
+        runner.teardown_databases(old_config)
+    report = json.dumps({
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'database': settings.DATABASES['default']['ENGINE'],
+        'users': args.users,
+        'recipes': args.recipes,
+        'results': results,
+    }, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
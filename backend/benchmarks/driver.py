@@ -0,0 +1,95 @@
+"""
+Прогон запросов к API и подсчет метрик.
+"""
+import random
+import statistics
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+
+DEEP_PAGE = 50
+DEEP_PAGE_LIMIT = 6
+
+
+def get_scenarios(rnd):
+    """Сценарии: имя -> функция, возвращающая URL следующего запроса."""
+    tag_slugs = list(Tag.objects.values_list('slug', flat=True))
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    # Глубокая страница, но не дальше последней при малом числе рецептов.
+    deep_page = min(DEEP_PAGE, max(1, -(-len(recipe_ids) // DEEP_PAGE_LIMIT)))
+    prefixes = sorted({
+        name[:3] for name in Ingredient.objects.values_list('name', flat=True)
+    })
+    return {
+        'recipes_list': lambda: '/api/recipes/',
+        'recipes_filtered': lambda: (
+            f'/api/recipes/?tags={rnd.choice(tag_slugs)}'
+            f'&is_favorited=1&limit=20'
+        ),
+        'recipes_deep_page': lambda: (
+            f'/api/recipes/?page={deep_page}&limit={DEEP_PAGE_LIMIT}'
+        ),
+        'recipes_cursor': lambda: '/api/recipes/?cursor=&limit=20',
+        'recipe_detail': lambda: f'/api/recipes/{rnd.choice(recipe_ids)}/',
+        'subscriptions': lambda: (
+            '/api/users/subscriptions/?recipes_limit=3&limit=10'
+        ),
+        'ingredients_autocomplete': lambda: (
+            f'/api/ingredients/autocomplete/?name={rnd.choice(prefixes)}'
+        ),
+        'download_shopping_cart': lambda: (
+            '/api/recipes/download_shopping_cart/'
+        ),
+    }
+
+
+def percentile(values, percent):
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+def run_scenario(client, next_url, requests):
+    timings, queries, sizes = [], [], []
+    started = time.perf_counter()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as context:
+            request_started = time.perf_counter()
+            response = client.get(next_url())
+            body = (b''.join(response.streaming_content)
+                    if response.streaming else response.content)
+            timings.append((time.perf_counter() - request_started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{next_url()}: {response.status_code} {body[:200]!r}'
+            )
+        queries.append(len(context))
+        sizes.append(len(body))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries_per_request': round(statistics.mean(queries), 2),
+        'max_queries': max(queries),
+        'throughput_rps': round(requests / elapsed, 1),
+        'avg_response_bytes': round(statistics.mean(sizes)),
+    }
+
+
+def run(users, requests=100, scenarios=None, random_seed=0):
+    """Прогоняет сценарии от имени случайного пользователя."""
+    rnd = random.Random(random_seed)
+    client = APIClient()
+    client.force_authenticate(rnd.choice(list(users)))
+    results = {}
+    for name, next_url in get_scenarios(rnd).items():
+        if scenarios and name not in scenarios:
+            continue
+        results[name] = run_scenario(client, next_url, requests)
+    return results
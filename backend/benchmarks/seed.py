@@ -0,0 +1,105 @@
+"""
+Заполнение базы данными для замеров.
+"""
+import io
+import random
+
+from django.conf import settings
+from django.core.management import call_command
+
+from recipes.cache import USERS, bump_version, invalidate_recipes
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            RecipeTag, ShoppingCart, ShoppingCartTotal, Tag)
+from recipes.search import update_search_vectors
+from users.models import Follow, User
+
+SEED_PREFIX = 'bench_'
+
+
+def seed(users=100, recipes=1000, ingredients_per_recipe=8,
+         favorites_per_user=20, cart_per_user=5, follows_per_user=10,
+         random_seed=0):
+    """Создает пользователей, рецепты, избранное, корзины и подписки."""
+    rnd = random.Random(random_seed)
+    call_command(
+        'import_db', settings.BASE_DIR / 'data/ingredients.csv',
+        stdout=io.StringIO()
+    )
+    call_command('import_tag', stdout=io.StringIO())
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    User.objects.bulk_create(
+        User(username=f'{SEED_PREFIX}{i}',
+             email=f'{SEED_PREFIX}{i}@example.com',
+             first_name='Bench', last_name=str(i))
+        for i in range(users)
+    )
+    user_ids = list(User.objects.filter(
+        username__startswith=SEED_PREFIX
+    ).values_list('id', flat=True))
+
+    Recipe.objects.bulk_create(
+        Recipe(author_id=rnd.choice(user_ids), name=f'{SEED_PREFIX}{i}',
+               text='Рецепт для замеров.',
+               cooking_time=rnd.randint(1, 100),
+               image='recipes/images/bench.png')
+        for i in range(recipes)
+    )
+    recipe_ids = list(Recipe.objects.filter(
+        name__startswith=SEED_PREFIX
+    ).values_list('id', flat=True))
+
+    IngredientRecipe.objects.bulk_create(
+        (
+            IngredientRecipe(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                             amount=rnd.randint(1, 1000))
+            for recipe_id in recipe_ids
+            for ingredient_id in rnd.sample(
+                ingredient_ids,
+                min(ingredients_per_recipe, len(ingredient_ids))
+            )
+        ),
+        batch_size=5000,
+    )
+    RecipeTag.objects.bulk_create(
+        (
+            RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rnd.sample(tag_ids, rnd.randint(1, len(tag_ids)))
+        ),
+        batch_size=5000,
+    )
+    for model, per_user in ((Favorite, favorites_per_user),
+                            (ShoppingCart, cart_per_user)):
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in rnd.sample(
+                    recipe_ids, min(per_user, len(recipe_ids))
+                )
+            ),
+            batch_size=5000,
+        )
+    Follow.objects.bulk_create(
+        (
+            Follow(user_id=user_id, following_id=following_id)
+            for user_id in user_ids
+            for following_id in rnd.sample(
+                user_ids, min(follows_per_user + 1, len(user_ids))
+            )
+            if following_id != user_id
+        ),
+        batch_size=5000,
+    )
+    # bulk_create не отправляет сигналы: счетчики, итоги корзин, ленты,
+    # рейтинги и поисковые векторы строятся заново, кэши сбрасываются.
+    call_command('recount', stdout=io.StringIO())
+    ShoppingCartTotal.objects.rebuild()
+    call_command('rebuild_feeds', stdout=io.StringIO())
+    call_command('refresh_rankings', stdout=io.StringIO())
+    update_search_vectors(Recipe.objects.filter(id__in=recipe_ids))
+    invalidate_recipes()
+    bump_version(USERS)
+    return User.objects.filter(id__in=user_ids)
@@ -2,7 +2,9 @@
 Настройки админ-зоны.
 """
 from django.contrib import admin
-from .models import Tag, Recipe, IngredientRecipe, ShoppingCart, Favorite
+from .models import (Tag, Recipe, IngredientRecipe, ShoppingCart, Favorite,
+                     ShoppingCartTotal)
+from .search import search_recipes, update_search_vectors
 
 
 class IngredientRecipeInline(admin.TabularInline):
@@ -17,6 +19,21 @@ class RecipeAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     inlines = (IngredientRecipeInline,)
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_recipes(queryset, search_term), False
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = ShoppingCartTotal.objects.get_recipe_amounts(recipe)
+        super().save_related(request, form, formsets, change)
+        ShoppingCartTotal.objects.change_recipe(
+            recipe, old_amounts,
+            ShoppingCartTotal.objects.get_recipe_amounts(recipe),
+        )
+        update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
+
 
 @admin.register(Tag)
 class TagsAdmin(admin.ModelAdmin):
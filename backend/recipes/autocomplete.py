@@ -0,0 +1,80 @@
+"""
+Автодополнение ингредиентов.
+
+На PostgreSQL поиск идет по триграммному индексу на UPPER(name),
+на остальных базах — по индексу в памяти процесса, который строится
+один раз и перестраивается при смене версии кэша ингредиентов.
+"""
+from bisect import bisect_left
+from itertools import islice
+from threading import Lock
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+
+from .cache import INGREDIENTS, get_version
+from .models import Ingredient
+
+_index = None
+_index_lock = Lock()
+
+
+class IngredientIndex:
+    """Отсортированный по названию индекс ингредиентов."""
+    version = None
+
+    def __init__(self, ingredients):
+        self.ingredients = sorted(
+            ingredients, key=lambda item: (item.name.lower(), item.id)
+        )
+        self.keys = [item.name.lower() for item in self.ingredients]
+
+    def search(self, query, limit):
+        query = query.lower()
+        start = bisect_left(self.keys, query)
+        prefix_end = start
+        while (prefix_end < len(self.keys)
+               and self.keys[prefix_end].startswith(query)):
+            prefix_end += 1
+        found = self.ingredients[start:min(prefix_end, start + limit)]
+        if len(found) < limit:
+            found.extend(islice(
+                (
+                    item for position, (key, item) in enumerate(
+                        zip(self.keys, self.ingredients)
+                    )
+                    if not start <= position < prefix_end and query in key
+                ),
+                limit - len(found),
+            ))
+        return found
+
+
+def get_ingredient_index():
+    global _index
+    version = get_version(INGREDIENTS)
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = IngredientIndex(
+                Ingredient.objects.only('id', 'name', 'measurement_unit')
+            )
+            _index.version = version
+        return _index
+
+
+def autocomplete_ingredients(queryset, query, limit):
+    """
+    Ингредиенты, название которых начинается с query, затем те,
+    в названии которых query встречается; не больше limit штук.
+    """
+    if connection.vendor != 'postgresql':
+        return get_ingredient_index().search(query, limit)
+    return list(
+        queryset.filter(name__icontains=query).annotate(
+            rank=Case(
+                When(name__istartswith=query, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('rank', 'name')[:limit]
+    )
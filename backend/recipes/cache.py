@@ -0,0 +1,65 @@
+"""
+Версии кэша справочных данных.
+
+Закэшированные данные хранятся под ключами с версией пространства
+имен, поэтому для инвалидации достаточно увеличить версию.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+RECIPES = 'recipes'
+USERS = 'users'
+
+
+def _version_key(namespace):
+    return f'{namespace}:version'
+
+
+def get_version(namespace):
+    # Начальная версия берется из времени, чтобы после вытеснения
+    # ключа версии не вернуться к уже использованному номеру.
+    cache.add(_version_key(namespace), time.time_ns(), None)
+    return cache.get(_version_key(namespace))
+
+
+def bump_version(namespace):
+    try:
+        return cache.incr(_version_key(namespace))
+    except ValueError:
+        version = time.time_ns()
+        cache.set(_version_key(namespace), version, None)
+        return version
+
+
+def get_recipe_namespace(recipe_id):
+    """Пространство имен с версией отдельного рецепта."""
+    return f'{RECIPES}:{recipe_id}'
+
+
+def invalidate_recipes(recipe_ids=()):
+    """Увеличивает общую версию рецептов и версии рецептов recipe_ids."""
+    bump_version(RECIPES)
+    for recipe_id in recipe_ids:
+        bump_version(get_recipe_namespace(recipe_id))
+
+
+def make_key(namespace, *parts):
+    return ':'.join(
+        (namespace, str(get_version(namespace)), *map(str, parts))
+    )
+
+
+def get_tag_ids_by_slug():
+    """Словарь slug -> id тэгов из кэша."""
+    from .models import Tag
+
+    key = make_key(TAGS, 'ids_by_slug')
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids, settings.REFERENCE_CACHE_TIMEOUT)
+    return tag_ids
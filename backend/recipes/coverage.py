@@ -0,0 +1,198 @@
+"""
+Подбор рецептов по имеющимся ингредиентам.
+
+Инвертированный индекс ингредиент -> отсортированный массив id рецептов
+хранится в памяти процесса. Он строится один раз, а при смене версии
+кэша рецептов дочитывает журнал RecipeChange с последней прочитанной
+записи и пересобирает только измененные рецепты. Готовый индекс не
+меняется: обновление строит новый рядом и подменяет ссылку на него.
+"""
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import timedelta
+from threading import Lock
+
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from backend import constants
+from .cache import RECIPES, get_version
+from .models import IngredientRecipe, RecipeChange
+
+_index = None
+_index_lock = Lock()
+
+
+def get_recipe_ingredients(recipe_ids=None):
+    """Словарь id рецепта -> список id его ингредиентов."""
+    rows = IngredientRecipe.objects.order_by('recipe_id', 'ingredient_id')
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    grouped = {}
+    for recipe_id, ingredient_id in rows.values_list(
+            'recipe_id', 'ingredient_id'
+    ).iterator(chunk_size=constants.RECIPE_INDEX_CHUNK_SIZE):
+        grouped.setdefault(recipe_id, []).append(ingredient_id)
+    return grouped
+
+
+class RecipeIngredientIndex:
+    """
+    Инвертированный индекс ингредиентов рецептов.
+
+    last_change_id — последняя прочитанная запись журнала, gaps —
+    пропущенные id журнала до нее (транзакции, еще не закоммиченные
+    при чтении) с временем, когда пропуск замечен.
+    """
+
+    def __init__(self, version, postings, recipe_ingredients,
+                 last_change_id, gaps, refreshed):
+        self.version = version
+        self.postings = postings
+        self.recipe_ingredients = recipe_ingredients
+        self.last_change_id = last_change_id
+        self.gaps = gaps
+        self.refreshed = refreshed
+
+    @classmethod
+    def build(cls, version):
+        refreshed = timezone.now()
+        RecipeChange.objects.prune(refreshed)
+        # Журнал читается до рецептов: изменение, попавшее в обе
+        # выборки, при обновлении просто применится еще раз.
+        last_change_id, gaps = cls.get_journal_position(refreshed)
+        postings = {}
+        recipe_ingredients = {}
+        # Рецепты идут по возрастанию id, поэтому массивы остаются
+        # отсортированными без вставок в середину.
+        for recipe_id, ingredient_ids in get_recipe_ingredients().items():
+            recipe_ingredients[recipe_id] = array('q', ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                postings.setdefault(
+                    ingredient_id, array('q')
+                ).append(recipe_id)
+        return cls(version, postings, recipe_ingredients, last_change_id,
+                   gaps, refreshed)
+
+    @staticmethod
+    def get_journal_position(now):
+        """
+        Последний id журнала и пропуски до него. Пропуски ищутся среди
+        записей моложе RECIPE_INDEX_GAP_TIMEOUT: более старые
+        транзакции уже закоммичены или не будут учтены и при обновлении.
+        """
+        settled_id = RecipeChange.objects.filter(
+            created__lt=now - timedelta(
+                seconds=constants.RECIPE_INDEX_GAP_TIMEOUT
+            )
+        ).aggregate(last=Max('id'))['last']
+        recent_ids = set(RecipeChange.objects.filter(
+            id__gt=settled_id or 0
+        ).values_list('id', flat=True))
+        last_change_id = max([settled_id or 0, *recent_ids])
+        if settled_id is None:
+            settled_id = min(recent_ids, default=1) - 1
+        gaps = {
+            change_id: now
+            for change_id in range(settled_id + 1, last_change_id)
+            if change_id not in recent_ids
+        }
+        return last_change_id, gaps
+
+    def get_changes(self, now):
+        """
+        Id измененных рецептов из новых записей журнала и пропусков,
+        новые last_change_id и gaps.
+        """
+        changes = dict(RecipeChange.objects.filter(
+            Q(id__gt=self.last_change_id) | Q(id__in=self.gaps)
+        ).values_list('id', 'recipe_id'))
+        last_change_id = max([self.last_change_id, *changes])
+        gap_deadline = now - timedelta(
+            seconds=constants.RECIPE_INDEX_GAP_TIMEOUT
+        )
+        gaps = {
+            change_id: noticed
+            for change_id, noticed in self.gaps.items()
+            if change_id not in changes and noticed >= gap_deadline
+        }
+        for change_id in range(self.last_change_id + 1, last_change_id):
+            if change_id not in changes:
+                gaps[change_id] = now
+        return set(changes.values()), last_change_id, gaps
+
+    def refresh(self, version):
+        """Новый индекс с изменениями рецептов с прошлого обновления."""
+        now = timezone.now()
+        if self.refreshed < now - timedelta(
+                seconds=constants.RECIPE_CHANGE_TTL):
+            # Записи журнала с прошлого обновления могли быть удалены
+            # prune() здесь или командой prune_recipe_changes.
+            return self.build(version)
+        RecipeChange.objects.prune(now)
+        changed, last_change_id, gaps = self.get_changes(now)
+        if not changed:
+            return type(self)(version, self.postings,
+                              self.recipe_ingredients, last_change_id,
+                              gaps, now)
+        postings = dict(self.postings)
+        recipe_ingredients = dict(self.recipe_ingredients)
+        copied = set()
+
+        def get_posting(ingredient_id):
+            # Массивы старого индекса не меняются, меняются их копии.
+            if ingredient_id not in copied:
+                postings[ingredient_id] = array(
+                    'q', postings.get(ingredient_id, ())
+                )
+                copied.add(ingredient_id)
+            return postings[ingredient_id]
+
+        for recipe_id in changed:
+            for ingredient_id in recipe_ingredients.pop(recipe_id, ()):
+                posting = get_posting(ingredient_id)
+                del posting[bisect_left(posting, recipe_id)]
+        for recipe_id, ingredient_ids in get_recipe_ingredients(
+                changed).items():
+            recipe_ingredients[recipe_id] = array('q', ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                insort(get_posting(ingredient_id), recipe_id)
+        return type(self)(version, postings, recipe_ingredients,
+                          last_change_id, gaps, now)
+
+    def rank(self, ingredient_ids):
+        """
+        Рецепты, где есть хотя бы один из ингредиентов, в виде
+        (id, доля покрытых ингредиентов, число недостающих): сначала
+        с наибольшим покрытием, затем с наименьшим числом недостающих.
+        """
+        covered = Counter()
+        for ingredient_id in set(ingredient_ids):
+            covered.update(self.postings.get(ingredient_id, ()))
+        ranked = []
+        for recipe_id, count in covered.items():
+            total = len(self.recipe_ingredients[recipe_id])
+            ranked.append((recipe_id, count / total, total - count))
+        ranked.sort(key=lambda item: (-item[1], item[2], -item[0]))
+        return ranked
+
+
+def get_recipe_ingredient_index():
+    global _index
+    # Версия читается до журнала: все, что было до ее смены, уже
+    # закоммичено и попадет в индекс.
+    version = get_version(RECIPES)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None:
+            _index = RecipeIngredientIndex.build(version)
+        elif _index.version != version:
+            _index = _index.refresh(version)
+        return _index
+
+
+def rank_recipes_by_ingredients(ingredient_ids):
+    return get_recipe_ingredient_index().rank(ingredient_ids)
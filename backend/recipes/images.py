@@ -0,0 +1,97 @@
+"""
+Фоновая подготовка уменьшенных копий изображений рецептов.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import PurePosixPath
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image
+
+from backend import constants
+from .cache import invalidate_recipes
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'thumbnail': constants.IMAGE_THUMBNAIL_SIZE,
+    'card': constants.IMAGE_CARD_SIZE,
+    'full': constants.IMAGE_FULL_SIZE,
+}
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_rendition_name(image_name, rendition):
+    stem = PurePosixPath(image_name).stem
+    extension = settings.IMAGE_RENDITION_FORMAT.lower()
+    return f'recipes/renditions/{stem}_{rendition}.{extension}'
+
+
+def build_renditions(image_name):
+    """Сохраняет копии изображения и возвращает {вариант: путь}."""
+    with default_storage.open(image_name) as file, Image.open(file) as image:
+        image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        renditions = {}
+        for rendition, size in RENDITIONS.items():
+            name = get_rendition_name(image_name, rendition)
+            if not default_storage.exists(name):
+                copy = image.copy()
+                copy.thumbnail(size)
+                buffer = io.BytesIO()
+                copy.save(buffer, settings.IMAGE_RENDITION_FORMAT,
+                          quality=constants.IMAGE_RENDITION_QUALITY)
+                name = default_storage.save(name, ContentFile(
+                    buffer.getvalue()
+                ))
+            renditions[rendition] = name
+    return renditions
+
+
+def process_image(image_name):
+    from .models import Recipe
+
+    try:
+        renditions = build_renditions(image_name)
+        recipes = Recipe.objects.filter(image=image_name)
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        recipes.update(image_renditions=renditions)
+        invalidate_recipes(recipe_ids)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', image_name)
+    finally:
+        if settings.IMAGE_RENDITION_WORKERS:
+            connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_RENDITION_WORKERS,
+                thread_name_prefix='image-renditions',
+            )
+        return _executor
+
+
+def schedule_renditions(recipe):
+    """
+    Ставит обработку изображения рецепта в очередь после коммита.
+
+    При IMAGE_RENDITION_WORKERS = 0 обработка идет в текущем потоке.
+    """
+    if settings.IMAGE_RENDITION_WORKERS:
+        task = partial(get_executor().submit, process_image, recipe.image.name)
+    else:
+        task = partial(process_image, recipe.image.name)
+    transaction.on_commit(task)
@@ -0,0 +1,136 @@
+"""
+Базовая команда для пакетного импорта справочников.
+"""
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from backend import constants
+from recipes.cache import bump_version
+
+
+class ImportCommand(BaseCommand):
+    """
+    Загружает строки из JSON, JSON Lines или CSV пачками.
+
+    Уже существующие записи пропускаются по уникальным ограничениям
+    модели, поэтому команду можно запускать повторно.
+    """
+    model = None
+    fields = ()
+    default_path = None
+    cache_namespace = None
+    success_message = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=settings.BASE_DIR / self.default_path,
+            help='Путь к файлу .json, .jsonl или .csv.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=constants.IMPORT_BATCH_SIZE,
+            help='Количество строк в одной вставке.'
+        )
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загрузить через COPY во временную таблицу (PostgreSQL).'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Выполнить импорт и откатить транзакцию.'
+        )
+
+    def read_rows(self, path):
+        suffix = Path(path).suffix
+        with open(path, 'r', encoding='utf-8-sig', newline='') as file:
+            if suffix == '.csv':
+                for values in csv.reader(file):
+                    if values:
+                        yield dict(zip(self.fields, values))
+            elif suffix == '.jsonl':
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+            elif suffix == '.json':
+                yield from json.load(file)
+            else:
+                raise CommandError(f'Неизвестный формат файла: {path}')
+
+    def read_batches(self, path, batch_size):
+        rows = self.read_rows(path)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            try:
+                yield [tuple(row[field] for field in self.fields)
+                       for row in batch]
+            except KeyError as error:
+                raise CommandError(f'В строке нет поля {error}')
+
+    def insert_batch(self, batch):
+        self.model.objects.bulk_create(
+            (self.model(**dict(zip(self.fields, values)))
+             for values in batch),
+            ignore_conflicts=True,
+        )
+
+    def copy_batch(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        columns = ', '.join(self.fields)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS import_staging '
+                f'ON COMMIT DROP AS SELECT {columns} '
+                f'FROM {self.model._meta.db_table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY import_staging ({columns}) FROM STDIN WITH CSV',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {self.model._meta.db_table} ({columns}) '
+                f'SELECT {columns} FROM import_staging '
+                'ON CONFLICT DO NOTHING'
+            )
+            cursor.execute('TRUNCATE import_staging')
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy доступен только для PostgreSQL.')
+        write_batch = (
+            self.copy_batch if options['copy'] else self.insert_batch
+        )
+        started = time.perf_counter()
+        total = 0
+        try:
+            with transaction.atomic():
+                count_before = self.model.objects.count()
+                for batch in self.read_batches(
+                        options['path'], options['batch_size']):
+                    write_batch(batch)
+                    total += len(batch)
+                created = self.model.objects.count() - count_before
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+        except (OSError, ValueError) as error:
+            raise CommandError(error) from error
+        elapsed = time.perf_counter() - started
+        if not options['dry_run']:
+            bump_version(self.cache_namespace)
+        self.stdout.write(
+            f'Строк прочитано: {total}, добавлено: {created}, '
+            f'{total / elapsed if elapsed else total:.0f} строк/с'
+            + (' (dry-run, изменения отменены)' if options['dry_run'] else '')
+        )
+        self.stdout.write(self.style.SUCCESS(self.success_message))
@@ -0,0 +1,31 @@
+"""
+Команда для подготовки уменьшенных копий изображений рецептов.
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии изображений рецептов без них.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Обработать все рецепты, а не только без копий.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_renditions={})
+        processed = 0
+        for recipe_id, image in recipes.values_list('id', 'image').iterator():
+            Recipe.objects.filter(id=recipe_id).update(
+                image_renditions=build_renditions(image)
+            )
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}'
+        ))
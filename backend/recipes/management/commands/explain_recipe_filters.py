@@ -0,0 +1,131 @@
+"""
+Команда для вывода планов запросов фильтров ленты рецептов.
+
+Запросы строятся тем же RecipeFilter, что и в RecipeViewSet. Для
+сравнения "до" и "после" запустите ее с --without-indexes и без:
+индексы фильтров (миграция 0007) удаляются внутри транзакции команды
+и возвращаются откатом, схема остается текущей.
+"""
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import RequestFactory
+
+from api.filters import RecipeFilter
+from recipes.cache import TAGS, bump_version
+from recipes.models import (Favorite, Recipe, RecipeTag, ShoppingCart,
+                            Tag)
+from users.models import User
+
+FILTER_INDEXES = (
+    (Recipe, 'recipe_author_pub_date_idx'),
+    (RecipeTag, 'recipetag_tag_recipe_idx'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Выводит EXPLAIN для запросов фильтров RecipeFilter.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Создать столько рецептов перед EXPLAIN и откатить их.'
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Выполнить запросы (EXPLAIN ANALYZE, только PostgreSQL).'
+        )
+        parser.add_argument(
+            '--without-indexes', action='store_true',
+            help='Удалить индексы фильтров на время EXPLAIN ("до").'
+        )
+
+    def drop_filter_indexes(self):
+        schema_editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model, name in FILTER_INDEXES:
+                index = next(
+                    index for index in model._meta.indexes
+                    if index.name == name
+                )
+                cursor.execute(str(index.remove_sql(model, schema_editor)))
+
+    def seed(self, count):
+        User.objects.bulk_create(
+            User(username=f'explain_{i}', email=f'explain_{i}@example.com')
+            for i in range(max(count // 10, 1))
+        )
+        users = list(User.objects.filter(username__startswith='explain_'))
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=f'explain_{i}', color=f'#00000{i}',
+                    slug=f'explain_{i}')
+                for i in range(3)
+            )
+        tags = list(Tag.objects.all())
+        Recipe.objects.bulk_create(
+            Recipe(author=users[i % len(users)], name=f'explain_{i}',
+                   text='', cooking_time=1, image='recipes/images/seed.png')
+            for i in range(count)
+        )
+        recipes = list(Recipe.objects.filter(author__in=users))
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tags[i % len(tags)])
+            for i, recipe in enumerate(recipes)
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(recipe=recipe, user=users[i % len(users)])
+                for i, recipe in enumerate(recipes[::3])
+            )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def get_querysets(self):
+        user = User.objects.order_by('-id').first()
+        tag = Tag.objects.order_by('id').first()
+        request = RequestFactory().get('/api/recipes/')
+        request.user = user
+        paths = {
+            'feed': {},
+            'author': {'author': getattr(user, 'id', '')},
+            'tags': {'tags': [getattr(tag, 'slug', '')]},
+            'is_favorited': {'is_favorited': 1},
+            'is_in_shopping_cart': {'is_in_shopping_cart': 1},
+            'popular': {'ordering': 'popular'},
+        }
+        querysets = {}
+        for name, data in paths.items():
+            filterset = RecipeFilter(
+                QueryDict(urlencode(data, doseq=True)),
+                Recipe.objects.all(), request=request,
+            )
+            if not filterset.is_valid():
+                raise CommandError(f'{name}: {filterset.errors.as_text()}')
+            querysets[name] = filterset.qs
+        return querysets
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options = {'analyze': True, 'buffers': True}
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                    # Тэги созданы bulk_create, без сигналов.
+                    bump_version(TAGS)
+                if options['without_indexes']:
+                    self.drop_filter_indexes()
+                for name, queryset in self.get_querysets().items():
+                    self.stdout.write(self.style.MIGRATE_HEADING(name))
+                    self.stdout.write(
+                        queryset[:6].explain(**explain_options)
+                    )
+                transaction.set_rollback(True)
+        finally:
+            if options['seed']:
+                bump_version(TAGS)
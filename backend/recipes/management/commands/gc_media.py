@@ -0,0 +1,63 @@
+"""
+Команда для удаления изображений, на которые не ссылается ни один рецепт.
+"""
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from backend import constants
+from recipes.models import Recipe
+
+IMAGES_DIR = 'recipes/images'
+RENDITIONS_DIR = 'recipes/renditions'
+
+
+class Command(BaseCommand):
+    help = 'Удаляет изображения рецептов и их копии без ссылок на них.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=constants.GC_MEDIA_MIN_AGE,
+            help='Не трогать файлы моложе этого числа секунд.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые будут удалены.'
+        )
+
+    def get_orphans(self, directory, referenced, min_age):
+        storage = Recipe._meta.get_field('image').storage
+        if not storage.exists(directory):
+            return []
+        deadline = time.time() - min_age
+        return [
+            name for name in (
+                f'{directory}/{filename}'
+                for filename in storage.listdir(directory)[1]
+            )
+            if name not in referenced
+            and storage.get_modified_time(name).timestamp() < deadline
+        ]
+
+    def handle(self, *args, **options):
+        images = set(Recipe.objects.values_list('image', flat=True))
+        renditions = {
+            name
+            for recipe_renditions in Recipe.objects.values_list(
+                'image_renditions', flat=True
+            )
+            for name in recipe_renditions.values()
+        }
+        orphans = (
+            self.get_orphans(IMAGES_DIR, images, options['min_age'])
+            + self.get_orphans(RENDITIONS_DIR, renditions, options['min_age'])
+        )
+        for name in orphans:
+            self.stdout.write(name)
+            if not options['dry_run']:
+                default_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов без ссылок: {len(orphans)}'
+            + (' (dry-run)' if options['dry_run'] else '')
+        ))
@@ -0,0 +1,19 @@
+"""
+Команда для очистки журнала изменений рецептов.
+
+Запускается периодически (cron, systemd timer), например раз в час:
+    python manage.py prune_recipe_changes
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.models import RecipeChange
+
+
+class Command(BaseCommand):
+    help = 'Удаляет устаревшие записи журнала изменений рецептов.'
+
+    def handle(self, *args, **options):
+        deleted = RecipeChange.objects.prune()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей журнала изменений: {deleted}'
+        ))
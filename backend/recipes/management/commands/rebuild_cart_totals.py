@@ -0,0 +1,53 @@
+"""
+Команда для пересборки итогов списков покупок.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingCartTotal
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает итоги списков покупок по корзинам пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сравнить итоги с корзинами, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            return self.check_totals()
+        ShoppingCartTotal.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            'Итоги списков покупок пересобраны'
+        ))
+
+    def check_totals(self):
+        live = {
+            (row['recipe__shopping_cart__user'], row['ingredient']):
+                row['total']
+            for row in ShoppingCartTotal.objects.get_live_totals()
+        }
+        stored = {
+            (user, ingredient): amount
+            for user, ingredient, amount in ShoppingCartTotal.objects
+            .values_list('user_id', 'ingredient_id', 'amount')
+        }
+        mismatches = [
+            (key, stored.get(key), live.get(key))
+            for key in live.keys() | stored.keys()
+            if stored.get(key) != live.get(key)
+        ]
+        for (user, ingredient), stored_amount, live_amount in mismatches:
+            self.stdout.write(
+                f'user={user} ingredient={ingredient}: '
+                f'{stored_amount} != {live_amount}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'Расхождений в итогах списков покупок: {len(mismatches)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Итоги списков покупок совпадают с корзинами'
+        ))
@@ -0,0 +1,16 @@
+"""
+Команда для пересборки лент подписок.
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.models import FeedItem
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок по подпискам пользователей.'
+
+    def handle(self, *args, **options):
+        FeedItem.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты подписок пересобраны: {FeedItem.objects.count()} записей'
+        ))
@@ -0,0 +1,98 @@
+"""
+Команда для пересчета рейтинга рецептов.
+
+Запускается периодически (cron, systemd timer), например раз в 10 минут:
+    python manage.py refresh_rankings
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import (Case, DateTimeField, FloatField, Func, Sum,
+                              Value, When)
+from django.db.models.functions import Power
+from django.utils import timezone
+
+from backend import constants
+from recipes.cache import RECIPES, bump_version
+from recipes.models import Favorite, RecipeRanking, ShoppingCart
+
+SECONDS_IN_DAY = 24 * 60 * 60
+
+
+class AgeInDays(Func):
+    """Возраст события в днях на момент now."""
+    arg_joiner = ' - '
+    template = f'EXTRACT(EPOCH FROM (%(expressions)s)) / {SECONDS_IN_DAY}'
+    output_field = FloatField()
+
+    def __init__(self, expression, now):
+        super().__init__(Value(now, output_field=DateTimeField()),
+                         expression)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, arg_joiner=') - JULIANDAY(',
+            template='(JULIANDAY(%(expressions)s))', **extra_context
+        )
+
+
+def decay(age_days, half_life_days):
+    return Power(Value(0.5), age_days / Value(float(half_life_days)))
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги popular и trending для рецептов.'
+
+    def get_scores(self, now):
+        """
+        {recipe_id: [popular_score, trending_score]} по событиям.
+
+        Затухание и суммы по рецепту считаются в БД, в Python приходит
+        по строке на рецепт из каждой модели событий.
+        """
+        scores = defaultdict(lambda: [0.0, 0.0])
+        trending_since = now - timedelta(
+            days=constants.RANKING_TRENDING_WINDOW_DAYS
+        )
+        for model, weight in (
+                (Favorite, constants.RANKING_FAVORITE_WEIGHT),
+                (ShoppingCart, constants.RANKING_SHOPPING_CART_WEIGHT)):
+            age = AgeInDays('created', now)
+            totals = model.objects.order_by().values('recipe_id').annotate(
+                popular=Sum(decay(
+                    age, constants.RANKING_POPULAR_HALF_LIFE_DAYS
+                )),
+                trending=Sum(Case(
+                    When(created__gte=trending_since, then=decay(
+                        age, constants.RANKING_TRENDING_HALF_LIFE_DAYS
+                    )),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )),
+            ).values_list('recipe_id', 'popular', 'trending')
+            for recipe_id, popular, trending in totals.iterator(
+                    chunk_size=constants.RANKING_CHUNK_SIZE):
+                score = scores[recipe_id]
+                score[0] += weight * popular
+                score[1] += weight * trending
+        return scores
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        scores = self.get_scores(now)
+        with transaction.atomic():
+            RecipeRanking.objects.all().delete()
+            RecipeRanking.objects.bulk_create(
+                (
+                    RecipeRanking(recipe_id=recipe_id, popular_score=popular,
+                                  trending_score=trending, refreshed=now)
+                    for recipe_id, (popular, trending) in scores.items()
+                ),
+                batch_size=constants.RANKING_CHUNK_SIZE,
+            )
+        bump_version(RECIPES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинг пересчитан для {len(scores)} рецептов'
+        ))
@@ -0,0 +1,58 @@
+"""
+Кэш принадлежности для пользователя.
+
+Для каждого пользователя в кэше хранятся id избранных рецептов, рецептов
+в списке покупок и авторов, на которых он подписан, в виде отсортированных
+array('q'). Множество загружается из базы при первом обращении и лежит
+под ключом с версией; после коммита изменения связи версия
+увеличивается, и следующее обращение загружает множество заново.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from backend import constants
+from users.models import Follow
+from .cache import bump_version, make_key
+from .models import Favorite, ShoppingCart
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+FOLLOWING = 'following'
+
+SOURCES = {
+    FAVORITES: (Favorite, 'recipe_id'),
+    SHOPPING_CART: (ShoppingCart, 'recipe_id'),
+    FOLLOWING: (Follow, 'following_id'),
+}
+KINDS = {model: kind for kind, (model, _) in SOURCES.items()}
+
+
+def get_namespace(kind, user_id):
+    return f'membership:{kind}:{user_id}'
+
+
+def get_member_ids(kind, user_id):
+    """Отсортированный array('q') с id из связей пользователя."""
+    # Версия читается до базы: если загрузка застала данные до коммита,
+    # они лягут под уже устаревшую версию.
+    key = make_key(get_namespace(kind, user_id))
+    ids = cache.get(key)
+    if ids is None:
+        model, field = SOURCES[kind]
+        ids = array('q', model.objects.filter(
+            user_id=user_id
+        ).order_by(field).values_list(field, flat=True))
+        cache.set(key, ids, constants.MEMBERSHIP_CACHE_TIMEOUT)
+    return ids
+
+
+def contains(ids, member_id):
+    position = bisect_left(ids, member_id)
+    return position < len(ids) and ids[position] == member_id
+
+
+def invalidate_members(kind, user_id):
+    """Вызывается после коммита изменения связей пользователя."""
+    bump_version(get_namespace(kind, user_id))
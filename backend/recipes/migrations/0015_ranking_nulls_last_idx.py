@@ -0,0 +1,66 @@
+# Generated by Django 3.2 on 2026-10-18 03:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+RANKING_INDEXES = (
+    ('ranking_popular_idx', 'popular_score'),
+    ('ranking_trending_idx', 'trending_score'),
+)
+
+
+def get_ranking_index(name, field, nulls_last):
+    return models.Index(F(field).desc(nulls_last=nulls_last),
+                        F('recipe').desc(), name=name)
+
+
+def create_ranking_indexes(apps, schema_editor):
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    # SQLite не поддерживает NULLS LAST в CREATE INDEX.
+    nulls_last = schema_editor.connection.vendor == 'postgresql'
+    for name, field in RANKING_INDEXES:
+        schema_editor.add_index(
+            RecipeRanking, get_ranking_index(name, field, nulls_last)
+        )
+
+
+def drop_ranking_indexes(apps, schema_editor):
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    for name, field in RANKING_INDEXES:
+        schema_editor.remove_index(
+            RecipeRanking, get_ranking_index(name, field, False)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_feeditem_pub_date'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reciperanking',
+            name='ranking_popular_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='reciperanking',
+            name='ranking_trending_idx',
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_ranking_indexes,
+                                     drop_ranking_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='reciperanking',
+                    index=models.Index(F('popular_score').desc(nulls_last=True), F('recipe').desc(), name='ranking_popular_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='reciperanking',
+                    index=models.Index(F('trending_score').desc(nulls_last=True), F('recipe').desc(), name='ranking_trending_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -1,14 +1,19 @@
 """
 Модели.
 """
+from datetime import timedelta
+
 from django.core.validators import (MinValueValidator, MaxValueValidator,
                                     RegexValidator)
 
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import F, Sum, UniqueConstraint
+from django.utils import timezone
 
 from backend import constants
-from users.models import User
+from users.models import Follow, User
+from .storage import HashedFileSystemStorage
 
 
 class Tag(models.Model):
@@ -66,22 +71,56 @@ class Recipe(models.Model):
     name = models.CharField(max_length=constants.RECIPE_NAME_MAX_LENGHT,
                             verbose_name='recipes')
     image = models.ImageField('Изображение',
-                              upload_to='recipes/images')
+                              upload_to='recipes/images',
+                              storage=HashedFileSystemStorage(),
+                              db_index=True)
+    image_renditions = models.JSONField('Уменьшенные копии изображения',
+                                        default=dict, blank=True)
     text = models.TextField('Описание')
     cooking_time = models.PositiveIntegerField(
         'Время приготовления (в минутах)',
         validators=[
             MinValueValidator(constants.RECIPE_COOKING_TIME_MIN),
             MaxValueValidator(constants.RECIPE_COOKING_TIME_MAX)])
+    favorites_count = models.PositiveIntegerField('В избранном', default=0)
+    in_carts_count = models.PositiveIntegerField('В списках покупок',
+                                                 default=0)
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+    search_vector = SearchVectorField('Поисковый вектор', null=True,
+                                      editable=False)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(fields=['pub_date', 'id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_favorites_count_idx'),
+        ]
+
+    # Поля, которые меняются только запросами UPDATE (F() и пересчет);
+    # сохранение объекта не должно записывать загруженные значения.
+    denormalized_fields = ('favorites_count', 'in_carts_count',
+                           'search_vector')
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+                and field.attname not in self.get_deferred_fields()
+            ]
+        super().save(*args, **kwargs)
+
 
 class IngredientRecipe(models.Model):
     """Модель ингредиентов в рецепте."""
@@ -121,12 +160,18 @@ class RecipeTag(models.Model):
         constraints = [
             models.UniqueConstraint(
                 fields=['recipe', 'tag'], name='recipetag_unique')]
+        indexes = [
+            models.Index(fields=['tag', 'recipe'],
+                         name='recipetag_tag_recipe_idx'),
+        ]
 
 
 class FavoriteShoppingCart(models.Model):
     """Абстрактная модель для модели Отслеживания и модели списка продуктов"""
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created = models.DateTimeField('Дата добавления', auto_now_add=True,
+                                   db_index=True)
 
     class Meta:
         abstract = True
@@ -166,3 +211,296 @@ class ShoppingCart(FavoriteShoppingCart):
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в Список продуктов'
+
+
+class RecipeRanking(models.Model):
+    """Рейтинг рецепта по избранному и спискам покупок с затуханием."""
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE,
+                                  primary_key=True, related_name='ranking')
+    popular_score = models.FloatField('Популярность', default=0)
+    trending_score = models.FloatField('Тренд', default=0)
+    refreshed = models.DateTimeField('Дата пересчета')
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(F('popular_score').desc(nulls_last=True),
+                         F('recipe').desc(),
+                         name='ranking_popular_idx'),
+            models.Index(F('trending_score').desc(nulls_last=True),
+                         F('recipe').desc(),
+                         name='ranking_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular_score:.2f}'
+
+
+class RecipeChangeManager(models.Manager):
+    """Журнал изменений рецептов."""
+
+    def prune(self, now=None):
+        """Удаляет записи старше RECIPE_CHANGE_TTL."""
+        now = now or timezone.now()
+        return self.filter(created__lt=now - timedelta(
+            seconds=constants.RECIPE_CHANGE_TTL
+        )).delete()[0]
+
+
+class RecipeChange(models.Model):
+    """
+    Журнал изменений рецептов для индекса подбора по ингредиентам.
+
+    Запись пишется в одной транзакции с изменением рецепта, индекс
+    дочитывает журнал по id.
+    """
+    recipe_id = models.BigIntegerField('Id рецепта')
+    created = models.DateTimeField('Дата изменения', auto_now_add=True,
+                                   db_index=True)
+
+    objects = RecipeChangeManager()
+
+    class Meta:
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+
+    def __str__(self):
+        return f'{self.id}: {self.recipe_id}'
+
+
+class ShoppingCartTotalManager(models.Manager):
+    """Инкрементальное обновление итогов списка покупок."""
+
+    @staticmethod
+    def get_recipe_amounts(recipe):
+        return dict(
+            IngredientRecipe.objects.filter(
+                recipe=recipe
+            ).values_list('ingredient_id', 'amount')
+        )
+
+    def get_live_totals(self):
+        """Итоги, посчитанные заново по корзинам пользователей."""
+        return IngredientRecipe.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values(
+            'recipe__shopping_cart__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+
+    @transaction.atomic
+    def apply(self, user_ids, deltas):
+        """Прибавляет deltas {ingredient_id: amount} к итогам user_ids."""
+        deltas = {
+            ingredient: delta for ingredient, delta in deltas.items() if delta
+        }
+        if not user_ids or not deltas:
+            return
+        existing = {
+            (total.user_id, total.ingredient_id): total
+            for total in self.select_for_update().filter(
+                user_id__in=user_ids, ingredient_id__in=deltas
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, delta in deltas.items():
+                total = existing.get((user_id, ingredient_id))
+                if total is None:
+                    if delta > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=delta,
+                        ))
+                    continue
+                total.amount += delta
+                if total.amount > 0:
+                    to_update.append(total)
+                else:
+                    to_delete.append(total.id)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ['amount'])
+        self.filter(id__in=to_delete).delete()
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Переносит изменение состава рецепта в корзины с этим рецептом."""
+        self.apply(
+            list(recipe.shopping_cart.values_list('user_id', flat=True)),
+            {
+                ingredient: (new_amounts.get(ingredient, 0)
+                             - old_amounts.get(ingredient, 0))
+                for ingredient in old_amounts.keys() | new_amounts.keys()
+            },
+        )
+
+    @transaction.atomic
+    def rebuild(self, batch_size=2000):
+        self.all().delete()
+        self.bulk_create(
+            (
+                self.model(
+                    user_id=row['recipe__shopping_cart__user'],
+                    ingredient_id=row['ingredient'],
+                    amount=row['total'],
+                )
+                for row in self.get_live_totals().iterator()
+            ),
+            batch_size=batch_size,
+        )
+
+
+class ShoppingCartTotal(models.Model):
+    """Итоговое количество ингредиента в списке покупок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='shopping_cart_totals')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE,
+                                   related_name='shopping_cart_totals')
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingCartTotalManager()
+
+    class Meta:
+        verbose_name = 'Итог списка продуктов'
+        verbose_name_plural = 'Итоги списков продуктов'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_total'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} {self.amount}'
+
+
+class FeedItemManager(models.Manager):
+    """
+    Лента рецептов авторов, на которых подписан пользователь.
+
+    Рецепты авторов, у которых не больше FEED_FANOUT_MAX_FOLLOWERS
+    подписчиков, раскладываются по лентам при публикации. Рецепты
+    остальных авторов выбираются при чтении и сливаются с лентой.
+    """
+
+    def fan_out(self, recipe):
+        """Раскладывает новый рецепт по лентам подписчиков автора."""
+        follower_ids = list(Follow.objects.filter(
+            following_id=recipe.author_id
+        ).values_list('user_id', flat=True)[
+            :constants.FEED_FANOUT_MAX_FOLLOWERS + 1
+        ])
+        if len(follower_ids) > constants.FEED_FANOUT_MAX_FOLLOWERS:
+            return
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, author_id=recipe.author_id,
+                           recipe=recipe, pub_date=recipe.pub_date)
+                for user_id in follower_ids
+            ],
+            batch_size=constants.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def backfill(self, user_ids, author_id):
+        """Добавляет в ленты user_ids последние рецепты автора."""
+        recipes = list(Recipe.objects.filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-id').values_list('id', 'pub_date')[
+            :constants.FEED_BACKFILL_RECIPES
+        ])
+        self.bulk_create(
+            (
+                self.model(user_id=user_id, author_id=author_id,
+                           recipe_id=recipe_id, pub_date=pub_date)
+                for user_id in user_ids
+                for recipe_id, pub_date in recipes
+            ),
+            batch_size=constants.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def add_follow(self, user_id, author_id):
+        if User.objects.filter(
+                pk=author_id,
+                followers_count__lte=constants.FEED_FANOUT_MAX_FOLLOWERS,
+        ).exists():
+            self.backfill([user_id], author_id)
+
+    def remove_follow(self, user_id, author_id):
+        self.filter(user_id=user_id, author_id=author_id).delete()
+        followers_count = User.objects.filter(pk=author_id).values_list(
+            'followers_count', flat=True
+        ).first()
+        if followers_count == constants.FEED_FANOUT_MAX_FOLLOWERS:
+            # Автор вернулся к раскладке при публикации: его рецепты,
+            # вышедшие без раскладки, добавляются подписчикам.
+            self.backfill(
+                Follow.objects.filter(following_id=author_id).values_list(
+                    'user_id', flat=True
+                ),
+                author_id,
+            )
+
+    @transaction.atomic
+    def rebuild(self):
+        self.all().delete()
+        for author_id in User.objects.filter(
+                followers_count__gt=0,
+                followers_count__lte=constants.FEED_FANOUT_MAX_FOLLOWERS,
+        ).values_list('id', flat=True).iterator():
+            self.backfill(
+                Follow.objects.filter(following_id=author_id).values_list(
+                    'user_id', flat=True
+                ),
+                author_id,
+            )
+
+    def get_sources(self, user):
+        """
+        Querysets строк (pub_date, recipe_id) ленты пользователя для
+        слияния keyset-пагинацией: разложенные рецепты и рецепты авторов
+        с большим числом подписчиков.
+        """
+        pulled_authors = list(Follow.objects.filter(
+            user=user,
+            following__followers_count__gt=(
+                constants.FEED_FANOUT_MAX_FOLLOWERS
+            ),
+        ).values_list('following_id', flat=True))
+        items = self.filter(user=user).values('pub_date', 'recipe_id')
+        if not pulled_authors:
+            return [items]
+        return [
+            items.exclude(author_id__in=pulled_authors),
+            Recipe.objects.filter(author_id__in=pulled_authors).values(
+                'pub_date', recipe_id=F('id')
+            ),
+        ]
+
+
+class FeedItem(models.Model):
+    """Рецепт в ленте подписок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='feed_items')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE,
+                               related_name='feed_items')
+    pub_date = models.DateTimeField()
+
+    objects = FeedItemManager()
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_item'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='feeditem_user_pub_date_idx'),
+        ]
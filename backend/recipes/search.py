@@ -0,0 +1,63 @@
+"""
+Полнотекстовый поиск рецептов.
+
+На PostgreSQL рецепт хранит tsvector по названию, ингредиентам и описанию
+(с русской морфологией) в поле search_vector под GIN-индексом. На других
+СУБД поиск идет по вхождению подстроки.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+
+from backend import constants
+from .models import IngredientRecipe, Recipe
+
+
+def get_search_vector():
+    ingredient_names = Subquery(
+        IngredientRecipe.objects.filter(recipe=OuterRef('pk'))
+        .order_by().values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names')
+    )
+    return (
+        SearchVector('name', weight='A',
+                     config=constants.SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B',
+                       config=constants.SEARCH_CONFIG)
+        + SearchVector('text', weight='C',
+                       config=constants.SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """Пересчитывает search_vector у рецептов из queryset."""
+    if connection.vendor != 'postgresql':
+        return 0
+    return queryset.update(search_vector=get_search_vector())
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, от наиболее релевантных."""
+    if connection.vendor != 'postgresql':
+        return queryset.filter(
+            Q(name__icontains=query)
+            | Q(text__icontains=query)
+            | Exists(IngredientRecipe.objects.filter(
+                recipe=OuterRef('pk'), ingredient__name__icontains=query
+            ))
+        )
+    search_query = SearchQuery(query, config=constants.SEARCH_CONFIG,
+                               search_type='websearch')
+    return queryset.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F('search_vector'), search_query)
+    ).order_by('-rank', '-pub_date', '-id')
+
+
+def update_ingredient_recipes(ingredient_id):
+    """Пересчитывает search_vector у рецептов с ингредиентом."""
+    return update_search_vectors(Recipe.objects.filter(
+        ingredientrecipes__ingredient_id=ingredient_id
+    ))
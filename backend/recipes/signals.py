@@ -0,0 +1,150 @@
+"""
+Сигналы для поддержки итогов списка покупок, счетчиков, ленты подписок,
+поискового индекса, журнала изменений рецептов, кэша принадлежности
+и кэша справочников и рецептов.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import Follow, User
+from .cache import (INGREDIENTS, TAGS, USERS, bump_version,
+                    get_recipe_namespace, invalidate_recipes)
+from .models import (Favorite, FeedItem, Ingredient, Recipe, RecipeChange,
+                     ShoppingCart, ShoppingCartTotal, Tag)
+from .membership import KINDS, invalidate_members
+from .search import update_ingredient_recipes
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счетчик, не опуская его ниже нуля."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        ShoppingCartTotal.objects.apply(
+            [instance.user_id],
+            ShoppingCartTotal.objects.get_recipe_amounts(instance.recipe_id),
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_cart_totals(sender, instance, **kwargs):
+    ShoppingCartTotal.objects.apply(
+        [instance.user_id],
+        {
+            ingredient: -amount
+            for ingredient, amount in ShoppingCartTotal.objects
+            .get_recipe_amounts(instance.recipe_id).items()
+        },
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id,
+                       RECIPE_COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+def invalidate_membership(sender, instance, **kwargs):
+    kind, user_id = KINDS[sender], instance.user_id
+    transaction.on_commit(lambda: invalidate_members(kind, user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipes_cache(sender, instance, **kwargs):
+    # После удаления в транзакции instance.id к коммиту уже None.
+    recipe_id = instance.id
+    transaction.on_commit(lambda: invalidate_recipes([recipe_id]))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def log_recipe_change(sender, instance, **kwargs):
+    RecipeChange.objects.create(recipe_id=instance.id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_recipe_cache(sender, instance, **kwargs):
+    # Меняются только счетчики рецепта; списки обновятся по таймауту.
+    namespace = get_recipe_namespace(instance.recipe_id)
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+@receiver(post_save, sender=User)
+def invalidate_users_cache(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: bump_version(USERS))
+
+
+@receiver(post_save, sender=Follow)
+def add_author_to_feed(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.following_id, 'followers_count', 1)
+        FeedItem.objects.add_follow(instance.user_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_author_from_feed(sender, instance, **kwargs):
+    change_counter(User, instance.following_id, 'followers_count', -1)
+    FeedItem.objects.remove_follow(instance.user_id, instance.following_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        update_ingredient_recipes(instance.id)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients_cache(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(INGREDIENTS))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags_cache(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(TAGS))
@@ -0,0 +1,40 @@
+"""
+Хранилище изображений рецептов с адресацией по содержимому.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class HashedFileSystemStorage(FileSystemStorage):
+    """
+    Называет файлы по SHA-256 содержимого.
+
+    Повторная загрузка того же изображения не пишет файл заново,
+    а возвращает имя уже сохраненного. Файлы без ссылок из рецептов
+    удаляет команда gc_media.
+    """
+
+    def get_hashed_name(self, name, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, sha256.hexdigest() + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            # Обновляем время изменения, чтобы gc_media не удалил файл,
+            # на который вот-вот сошлется новый рецепт.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
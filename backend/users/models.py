@@ -32,9 +32,15 @@ class User(AbstractUser):
         'Пароль',
         max_length=constants.USER_PASSWORD_MAX_LENGHT
     )
+    recipes_count = models.PositiveIntegerField('Рецептов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    # Счетчики меняются только запросами UPDATE (F() и пересчет);
+    # сохранение объекта не должно записывать загруженные значения.
+    denormalized_fields = ('recipes_count', 'followers_count')
+
     class Meta:
         verbose_name = 'пользователь'
         verbose_name_plural = 'Пользователи'
@@ -42,6 +48,16 @@ class User(AbstractUser):
     def str(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+                and field.attname not in self.get_deferred_fields()
+            ]
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     """Модель отслеживания."""